@@ -10,6 +10,11 @@ class Node(object):
     def __init__(self):
         self.children = []
         self.parents = []
+        #G, H and F are cached on the node. H is set once by the search,
+        #and F is updated whenever G or H is set.
+        self.g = 0
+        self.h = None
+        self.f = 0
 
     #Generate successor nodes/states from itself.
     @abstractmethod
@@ -29,6 +34,15 @@ class Node(object):
 
     def set_G(self, cost):
         self.g = cost
+        self.f = cost + (self.h or 0)
+
+    #The cached heuristic, None until set_H has been called
+    def get_H(self):
+        return self.h
+
+    def set_H(self, h):
+        self.h = h
+        self.f = self.g + h
 
     #Each node has to have to generate a id, to assess the uniqueness of the node. 
     @abstractmethod
@@ -62,8 +76,9 @@ class Node(object):
 
         return self.parents[0]
 
+    #F from the cached G and H values
     def calc_F(self):
-        return self.get_G() + self.calc_H()
+        return self.f
 
     def get_level(self):
         node = self
@@ -75,7 +90,7 @@ class Node(object):
         return level-1
 
     def __lt__(self, other):
-        return self.calc_F() < other.calc_F()
+        return self.f < other.f
 
     #Representation for the GUI
     @abstractmethod
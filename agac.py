@@ -0,0 +1,147 @@
+import argparse
+import json
+import sys
+from graph import load_graph
+from gac import QueueOrder, Consistency
+from domain import DomainStore, BitmaskDomainStore
+from search import SearchMode, TieBreak
+import solver
+import chromatic
+from stats import Stats
+from ordering import HEURISTICS
+from localsearch import LocalSearch
+
+#Command line entry point for running A*-GAC without a display.
+#    python -m agac solve input/rand-100-4-color1.txt -k 4
+#    python -m agac chromatic input/rand-50-4-color1.txt
+#    python -m agac color input/spiral-500-4-color1.txt --time-limit 5
+#Prints one JSON object per input file, with the coloring and stats.
+#Nothing here imports tkinter, so it runs on machines without a display.
+
+STORES = {"list": DomainStore, "bitmask": BitmaskDomainStore}
+
+def enum_choice(enum):
+    return [member.name.lower() for member in enum]
+
+#Arguments shared by the commands running the solver
+def add_solver_arguments(command):
+    command.add_argument("files", nargs="+", help="graph files in the input/ format")
+    command.add_argument("--engine", choices=enum_choice(solver.Engine), default="astar",
+        help="A* search, or depth-first MAC with backjumping")
+    command.add_argument("--mode", choices=enum_choice(SearchMode), default="best")
+    command.add_argument("--weight", type=float, default=2.0, help="weight of H in weighted mode")
+    command.add_argument("--beam-width", type=int, default=50, help="nodes kept per level in beam mode")
+    command.add_argument("--tiebreak", choices=enum_choice(TieBreak), default="fifo")
+    command.add_argument("--queue", choices=enum_choice(QueueOrder), default="fifo")
+    command.add_argument("--consistency", choices=enum_choice(Consistency), default="ac",
+        help="propagation strength, arc consistency or singleton arc consistency")
+    command.add_argument("--domains", choices=sorted(STORES), default="bitmask")
+    command.add_argument("--ordering", choices=sorted(HEURISTICS), default="min-domain",
+        help="variable ordering heuristic")
+    command.add_argument("--split", action="store_true",
+        help="solve the connected components of the graph separately")
+    command.add_argument("--peel", action="store_true",
+        help="only search the k-core, and color the vertices with fewer than k neighbors greedily")
+    command.add_argument("--break-symmetry", action="store_true",
+        help="only try the used colors and one unused color in each assumption")
+    command.add_argument("--cliques", action="store_true",
+        help="stop early if a clique has more than k vertices, and add cliques as AllDifferent constraints")
+    command.add_argument("--nogoods", type=int, nargs="?", const=10000, default=None,
+        help="record failed assumptions as nogoods in A*, keeping at most this many")
+    command.add_argument("--cache", action="store_true",
+        help="keep a binary cache of each parsed graph next to the file")
+    command.add_argument("--indent", type=int, default=None, help="pretty print the JSON")
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="agac", description="A*-GAC vertex coloring")
+    commands = parser.add_subparsers(dest="command")
+    commands.required = True
+
+    solve = commands.add_parser("solve", help="color graphs with k colors")
+    solve.add_argument("-k", type=int, required=True, help="number of colors")
+    solve.add_argument("--profile", action="store_true", help="collect engine counters and timings")
+    solve.add_argument("--split-workers", type=int, default=None,
+        help="processes solving the components with --split")
+    solve.add_argument("--snapshot-interval", type=float, default=None,
+        help="seconds between profile snapshots")
+    add_solver_arguments(solve)
+
+    chromatic = commands.add_parser("chromatic", help="find the smallest k, solving k values in parallel")
+    chromatic.add_argument("--workers", type=int, default=None, help="processes, defaults to the number of CPUs")
+    chromatic.add_argument("--k-min", type=int, default=None, help="smallest k to try")
+    chromatic.add_argument("--k-max", type=int, default=None, help="largest k to try")
+    chromatic.add_argument("--time-limit", type=float, default=None, help="seconds before reporting the best bounds")
+    add_solver_arguments(chromatic)
+
+    color = commands.add_parser("color", help="find a coloring with few colors by local search")
+    color.add_argument("files", nargs="+", help="graph files in the input/ format")
+    color.add_argument("--time-limit", type=float, default=10.0, help="seconds to search for each file")
+    color.add_argument("--max-iterations", type=int, default=None, help="tabu moves to try for each k")
+    color.add_argument("--seed", type=int, default=0)
+    color.add_argument("--cache", action="store_true",
+        help="keep a binary cache of each parsed graph next to the file")
+    color.add_argument("--indent", type=int, default=None, help="pretty print the JSON")
+    return parser
+
+#The keyword arguments for solver.solve given on the command line
+def solve_options(args):
+    return {
+        "mode": SearchMode[args.mode.upper()],
+        "store_class": STORES[args.domains],
+        "tiebreak": TieBreak[args.tiebreak.upper()],
+        "queue_order": QueueOrder[args.queue.upper()],
+        "consistency": Consistency[args.consistency.upper()],
+        "ordering": HEURISTICS[args.ordering],
+        "engine": solver.Engine[args.engine.upper()],
+        "weight": args.weight,
+        "beam_width": args.beam_width,
+        "split": args.split,
+        "peel": args.peel,
+        "break_symmetry": args.break_symmetry,
+        "cliques": args.cliques,
+        "nogoods": args.nogoods,
+    }
+
+def write(result, filename, args, out):
+    result["file"] = filename
+    out.write(json.dumps(result, indent=args.indent, sort_keys=True) + "\n")
+    out.flush()
+
+def run_solve(args, out):
+    for filename in args.files:
+        graph = load_graph(filename, args.cache)
+        stats = None
+        if args.profile:
+            stats = Stats(args.snapshot_interval)
+        result = solver.solve(graph, args.k, stats=stats, workers=args.split_workers, **solve_options(args))
+        write(result, filename, args, out)
+
+def run_chromatic(args, out):
+    for filename in args.files:
+        graph = load_graph(filename, args.cache)
+        result = chromatic.chromatic_number(graph,
+            workers=args.workers,
+            k_min=args.k_min,
+            k_max=args.k_max,
+            time_limit=args.time_limit,
+            **solve_options(args))
+        write(result, filename, args, out)
+
+def run_color(args, out):
+    for filename in args.files:
+        graph = load_graph(filename, args.cache)
+        search = LocalSearch(args.time_limit, args.max_iterations, args.seed)
+        write(search.search(graph), filename, args, out)
+
+def main(argv=None, out=sys.stdout):
+    args = build_parser().parse_args(argv)
+    if args.command == "solve":
+        run_solve(args, out)
+    elif args.command == "chromatic":
+        run_chromatic(args, out)
+    elif args.command == "color":
+        run_color(args, out)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,214 @@
+from gac import ConstraintInstance
+from search import EventDispatcher
+from domain import DomainStore
+
+#Depth-first search maintaining arc consistency (MAC), as an alternative to
+#the A* Search when memory is the problem. Search keeps every generated node,
+#while Backtracking only has one MacInstance. An assumption is propagated in
+#the instance's store, and undone from the trail when it fails, so memory is
+#O(V*d) however many nodes are explored.
+#Dead ends are handled with conflict-directed backjumping (CBJ). Every
+#domain reduction is explained by the decision levels that caused it, and
+#when all values of a variable fail the search jumps back to the deepest
+#level in their explanations, instead of to the previous level.
+#Events are sent to the listner like Search does, so the GUI can show the search.
+class Backtracking(object):
+
+    #listner, delay, stats, event_mode and max_rate work like for Search.
+    def __init__(self, listner, delay=0.001, stats=None, event_mode=None, max_rate=None):
+        if not hasattr(listner, "event"):
+            raise Exception("Listner does not have event method handler")
+        self.listner = listner
+        self.stats = stats
+        self.events = EventDispatcher(listner, event_mode, max_rate, delay)
+        #Assumptions made, and the assumptions that survived propagation.
+        #Counted like the generated and popped nodes of Search.
+        self.nodes_generated = 0
+        self.nodes_popped = 0
+        #Dead ends where levels were skipped
+        self.backjumps = 0
+        #Assumptions of the solution
+        self.assumptions = None
+
+    #Searches for a solution of the network. Returns the MacInstance with
+    #every domain fixed, or None if there is no solution.
+    #store_class is the domain representation, like for create_instance.
+    def search(self, network, store_class=DomainStore):
+        instance = network.create_instance(store_class, MacInstance)
+        store = instance.domain
+        stats = self.stats
+        instance.initialize()
+        instance.domain_filtering()
+        if instance.is_contradictory():
+            self.events.flush()
+            return None
+
+        frames = []
+        while True:
+            if store.is_fixed():
+                self.assumptions = len(frames)
+                #The last assumption has already sent the solution
+                if not frames:
+                    self.send_event(instance, 0)
+                self.events.flush()
+                return instance
+            #Next assumption. The values already removed from the variable's
+            #domain are part of the conflict if every remaining value fails.
+            v = instance.get_next_assumption()
+            frames.append(Frame(v, len(frames)+1, instance))
+
+            #Tries the values of the deepest frame until one survives
+            #propagation, jumping back over the frames that run out of values.
+            while True:
+                frame = frames[-1]
+                if frame.next < len(frame.values):
+                    value = frame.values[frame.next]
+                    frame.next += 1
+                    self.nodes_generated += 1
+                    if instance.decide(frame.variable, value, frame.level):
+                        self.nodes_popped += 1
+                        if stats is not None:
+                            stats.on_pop(self.nodes_generated, self.nodes_popped)
+                        self.send_event(instance, frame.level)
+                        break
+                    frame.conflicts |= instance.conflict & ~(1 << frame.level)
+                    instance.undo(frame.mark)
+                    continue
+
+                #Every value failed. The conflicts are the levels that
+                #caused the failures, and the deepest one is the latest
+                #assumption that can change the outcome.
+                conflicts = frame.conflicts
+                if not conflicts:
+                    self.events.flush()
+                    return None
+                target = conflicts.bit_length()-1
+                if target < frame.level-1:
+                    self.backjumps += 1
+                del frames[target:]
+                frame = frames[-1]
+                instance.undo(frame.mark)
+                frame.conflicts |= conflicts & ~(1 << target)
+
+    #The state is copied into the event, so it's only made when the event
+    #is delivered. With EventMode.LATEST the states held back are skipped,
+    #instead of being copied on every pop.
+    def send_event(self, instance, level):
+        if self.events.accepts(instance.domain.is_fixed()):
+            self.events.send(TrailState(instance, level), self.nodes_generated, self.nodes_popped)
+
+
+#An assumption on the search path of Backtracking. Holds the values left
+#to try for the variable, the marks its changes are undone to, and the
+#decision levels that explain the failures so far, as a bitmask.
+class Frame(object):
+    __slots__ = ("variable", "values", "next", "level", "mark", "conflicts")
+
+    #Values skipped by symmetry breaking are only symmetric to a tried value
+    #given the values every earlier assumption used, so then all earlier
+    #levels are part of the conflicts.
+    def __init__(self, variable, level, instance):
+        self.variable = variable
+        self.values = instance.branch_values(variable)
+        self.next = 0
+        self.level = level
+        self.mark = instance.mark()
+        self.conflicts = instance.explanations[variable]
+        if len(self.values) < instance.domain.size(variable):
+            self.conflicts |= (1 << level) - 2
+
+
+#ConstraintInstance that explains its domain reductions, for backjumping.
+#The explanation of a variable is a bitmask of the decision levels whose
+#assumptions have removed values from its domain, directly or through
+#propagation. A value removed by a constraint is explained by the
+#explanations of the constraint's other variables. Changes to the
+#explanations are kept on a trail, and undone together with the store.
+class MacInstance(ConstraintInstance):
+    def __init__(self, network, v, d):
+        super().__init__(network, v, d)
+        self.explanations = dict((variable, 0) for variable in v)
+        self.trail = []
+        #The explanation of the last domain wipeout
+        self.conflict = 0
+        #The level of the latest assumption, 0 before any
+        self.level = 0
+
+    def revise(self, v, c):
+        revised = super().revise(v, c)
+        if revised:
+            explanations = self.explanations
+            reason = explanations[v]
+            for other in c.variables:
+                if other != v:
+                    reason |= explanations[other]
+            self.explain(v, reason)
+            if self.domain.size(v) == 0:
+                self.conflict = reason
+        return revised
+
+    def explain(self, v, reason):
+        old = self.explanations[v]
+        if reason != old:
+            self.trail.append((v, old))
+            self.explanations[v] = reason
+
+    #Assumes value for v at the given decision level and propagates it.
+    #Returns false if a domain was wiped out, with the explanation in conflict.
+    def decide(self, v, value, level):
+        self.level = level
+        self.domain.assign(v, value)
+        self.explain(v, self.explanations[v] | 1 << level)
+        self.rerun(v)
+        return not self.is_contradictory()
+
+    #A value removed by a singleton check depends on the whole state, so
+    #its explanation is every level so far
+    def prune(self, v, value):
+        self.explain(v, self.explanations[v] | (1 << (self.level+1)) - 2)
+        self.conflict = self.explanations[v]
+        super().prune(v, value)
+
+    #Marks both the store and the explanations
+    def mark(self):
+        return (self.domain.mark(), len(self.trail))
+
+    #Undo the store and the explanations back to the mark
+    def undo(self, mark):
+        store_mark, explanation_mark = mark
+        self.domain.undo(store_mark)
+        trail = self.trail
+        explanations = self.explanations
+        while len(trail) > explanation_mark:
+            v, old = trail.pop()
+            explanations[v] = old
+
+
+#The state of a MacInstance when an event is sent. The store keeps changing
+#after the event, so the values are read right away, unlike the lazy gui
+#representation of a GacNode. Only made when the listner takes events.
+class TrailState(object):
+    def __init__(self, instance, level):
+        store = instance.domain
+        self.values = []
+        for v in instance.variables:
+            if store.is_singleton(v):
+                self.values.append((v, store.value(v)))
+            else:
+                self.values.append((v, -1))
+        self.solution = store.is_fixed()
+        self.level = level
+        self.unsatisfied = instance.count_unsatisfied_constraints()
+
+    def is_solution(self):
+        return self.solution
+
+    def gui_representation(self, generated, popped):
+        return {
+            "values": self.values,
+            "generated": generated,
+            "popped": popped,
+            "solution": self.solution,
+            "assumption": self.level,
+            "unsatisfied": self.unsatisfied,
+        }
@@ -0,0 +1,175 @@
+import argparse
+import glob
+import json
+import multiprocessing
+import platform
+import queue
+import resource
+import sys
+import time
+from graph import load_graph
+from search import SearchMode
+from gac import Consistency
+import solver
+from stats import Stats
+
+#Benchmark harness for the A*-GAC solver. Every graph file is solved for
+#every k, search mode and consistency level, each case in a fresh process so
+#the peak memory is measured per case and a case can be stopped when it runs
+#out of time.
+#The results are written as JSON, and can be compared against a stored
+#baseline from an earlier run to see speedups and regressions.
+#    python benchmark.py --output bench.json
+#    python benchmark.py --baseline bench.json --output new.json
+#    python benchmark.py --consistency ac restricted_sac sac
+#Larger graphs for scaling curves can be made with graphgen.py.
+
+#Measured for every case
+METRICS = ["time", "nodes_generated", "nodes_popped", "revisions", "constraint_checks", "probes", "peak_memory_kb"]
+
+#Runs one case in a worker process and puts the measurements on results.
+def run_case(filename, k, mode, consistency, results):
+    graph = load_graph(filename)
+    result = solver.solve(graph, k, mode=mode, consistency=consistency, stats=Stats())
+    stats = result["stats"]
+    profile = result["profile"]
+    measurement = {
+        "solved": result["solved"],
+        "time": stats["time"],
+        "nodes_generated": stats["nodes_generated"],
+        "nodes_popped": stats["nodes_popped"],
+        "revisions": profile["revisions"],
+        "constraint_checks": profile["checks"],
+        "probes": profile["probes"],
+    }
+    #ru_maxrss is in kilobytes on Linux
+    measurement["peak_memory_kb"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    results.put(measurement)
+
+#Runs a case in a new process, stopping it after timeout seconds.
+def measure(filename, k, mode, consistency, timeout):
+    results = multiprocessing.Queue()
+    process = multiprocessing.Process(target=run_case, args=(filename, k, mode, consistency, results))
+    process.start()
+    try:
+        measurement = results.get(timeout=timeout)
+        measurement["status"] = "ok"
+    except queue.Empty:
+        process.terminate()
+        measurement = {"status": "timeout", "time": timeout}
+    process.join()
+    return measurement
+
+#Runs every case, repeat times, and keeps the fastest run of each case.
+#consistencies are the propagation levels to run every case with, only
+#arc consistency by default.
+def run_benchmark(files, ks, modes, timeout, repeat=1, log=sys.stderr, consistencies=None):
+    cases = []
+    for filename in files:
+        for k in ks:
+            for mode in modes:
+                for consistency in consistencies or [Consistency.AC]:
+                    best = None
+                    for i in range(repeat):
+                        measurement = measure(filename, k, mode, consistency, timeout)
+                        if best is None or measurement["time"] < best["time"]:
+                            best = measurement
+                        if measurement["status"] == "timeout":
+                            break
+                    case = {"file": filename, "k": k, "mode": mode.name.lower(),
+                        "consistency": consistency.name.lower()}
+                    case.update(best)
+                    cases.append(case)
+                    log.write(format_case(case) + "\n")
+    return {
+        "meta": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "date": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "timeout": timeout,
+            "repeat": repeat,
+        },
+        "results": cases,
+    }
+
+#Results from before the consistency levels were added are arc consistency
+def case_key(case):
+    return (case["file"], case["k"], case["mode"], case.get("consistency", "ac"))
+
+def format_case(case):
+    line = case["file"] + " k=" + str(case["k"]) + " " + case["mode"] + " " + case["consistency"] + " " + case["status"]
+    if case["status"] == "ok":
+        line += " solved=" + str(case["solved"])
+        for metric in METRICS:
+            if metric in case:
+                line += " " + metric + "=" + str(round(case[metric], 4))
+    return line
+
+#Compares the results against a baseline. A case is a regression if it
+#times out when the baseline did not, finds another answer, or is more
+#than tolerance slower. Differences under min_delta seconds are taken as
+#noise. Returns a list of (key, speedup, regression, note)
+#for the cases found in both, where speedup is baseline time / new time.
+def compare(results, baseline, tolerance=0.1, min_delta=0.05):
+    old_cases = dict((case_key(case), case) for case in baseline["results"])
+    comparison = []
+    for case in results["results"]:
+        key = case_key(case)
+        old = old_cases.get(key)
+        if old is None:
+            continue
+        speedup = old["time"] / case["time"] if case["time"] else float("inf")
+        note = ""
+        regression = False
+        if case["status"] != old["status"]:
+            note = old["status"] + " -> " + case["status"]
+            regression = case["status"] == "timeout"
+        elif case["status"] == "ok" and case["solved"] != old["solved"]:
+            note = "solved " + str(old["solved"]) + " -> " + str(case["solved"])
+            regression = True
+        elif case["status"] == "ok":
+            note = "nodes " + str(old["nodes_generated"]) + " -> " + str(case["nodes_generated"])
+            slower = case["time"] - old["time"]
+            regression = slower > min_delta and case["time"] > old["time"]*(1 + tolerance)
+        comparison.append((key, speedup, regression, note))
+    return comparison
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark A*-GAC over graph files")
+    parser.add_argument("--files", nargs="+", default=None, help="graph files, defaults to input/*.txt")
+    parser.add_argument("-k", nargs="+", type=int, default=[3, 4, 5, 6], help="k values")
+    parser.add_argument("--modes", nargs="+", default=["best", "depth"],
+        choices=[mode.name.lower() for mode in SearchMode])
+    parser.add_argument("--consistency", nargs="+", default=["ac"],
+        choices=[consistency.name.lower() for consistency in Consistency],
+        help="propagation levels, to see when the stronger ones pay off")
+    parser.add_argument("--timeout", type=float, default=30.0, help="seconds per case")
+    parser.add_argument("--repeat", type=int, default=1, help="runs per case, the fastest is kept")
+    parser.add_argument("--output", default=None, help="file to write the results to")
+    parser.add_argument("--baseline", default=None, help="results file to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.1, help="slowdown allowed before it is a regression")
+    parser.add_argument("--min-delta", type=float, default=0.05, help="seconds of slowdown ignored as noise")
+    args = parser.parse_args(argv)
+
+    files = args.files or sorted(glob.glob("input/*.txt"))
+    modes = [SearchMode[mode.upper()] for mode in args.modes]
+    consistencies = [Consistency[consistency.upper()] for consistency in args.consistency]
+    results = run_benchmark(files, args.k, modes, args.timeout, args.repeat, consistencies=consistencies)
+    if args.output:
+        with open(args.output, "w") as out:
+            json.dump(results, out, indent=2, sort_keys=True)
+
+    regressions = 0
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        for key, speedup, regression, note in compare(results, baseline, args.tolerance, args.min_delta):
+            status = "REGRESSION" if regression else "ok"
+            print(key[0] + " k=" + str(key[1]) + " " + key[2] + " " + key[3] + " speedup=" + str(round(speedup, 2)) + " " + status + " " + note)
+            if regression:
+                regressions += 1
+        print(str(regressions) + " regressions")
+    return 1 if regressions else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,132 @@
+import multiprocessing
+from multiprocessing.connection import wait
+import time
+from vertexcoloring import VertexColoring
+import solver
+
+#Finds the chromatic number of a graph by running A*-GAC for several k values
+#at once, each in its own process. A greedy coloring gives the first upper
+#bound. Then k values below it are solved in parallel, highest first:
+#    - when a run with k finds a coloring, every run with a larger k is
+#      cancelled, since k is already a better upper bound.
+#    - when a run with k is proven infeasible, every run with k or less is
+#      cancelled, since none of them can have a solution either. A run with
+#      an incomplete search, like beam search, that finds no coloring proves
+#      nothing, and only the run itself is done.
+#The search stops when the bounds meet, or when time_limit seconds have
+#passed. Then the best bounds found so far are reported.
+#Cancelled runs are terminated. Each run sends its result through its own
+#pipe, so terminating one run can't damage the results of the others, and a
+#run that dies without a result is noticed through its process sentinel.
+#Such a run is reported as crashed, and proves nothing.
+#The time saved is measured against doing the finished runs one after
+#another, which is a lower bound on the time sequential runs would need.
+def chromatic_number(graph, workers=None, k_min=None, k_max=None, time_limit=None, **solve_options):
+    start = time.time()
+    workers = workers or multiprocessing.cpu_count()
+
+    greedy = VertexColoring.greedy_coloring(graph)
+    upper = max(greedy.values()) + 1 if greedy else 0
+    coloring = dict((graph.vertices[v].number, c) for v, c in greedy.items())
+    #Largest k proven to have no coloring
+    infeasible = 0 if graph.edges else -1
+    if k_min is not None:
+        infeasible = max(infeasible, k_min - 1)
+    #With cliques the largest clique found rules out every smaller k
+    #before any run is started
+    if solve_options.get("cliques"):
+        lower_bound = solver.lower_bound_of(graph, VertexColoring.cliques(graph))
+        infeasible = max(infeasible, lower_bound - 1)
+
+    highest = upper - 1
+    if k_max is not None:
+        highest = min(highest, k_max)
+    candidates = list(range(highest, infeasible, -1))
+    #k to (process, connection, started) of the runs not yet finished
+    running = {}
+    runs = []
+
+    def cancel(k):
+        process, connection, started = running.pop(k)
+        process.terminate()
+        process.join()
+        connection.close()
+        runs.append({"k": k, "solved": None, "cancelled": True, "time": time.time() - started})
+
+    while infeasible + 1 < upper:
+        while candidates and len(running) < workers:
+            k = candidates.pop(0)
+            connection, sender = multiprocessing.Pipe(duplex=False)
+            process = multiprocessing.Process(target=run_k, args=(graph, k, solve_options, sender))
+            process.daemon = True
+            process.start()
+            #The worker holds the only sending end, so a worker that dies
+            #closes the pipe
+            sender.close()
+            running[k] = (process, connection, time.time())
+        if not running:
+            break
+
+        timeout = None
+        if time_limit is not None:
+            timeout = max(0, time_limit - (time.time() - start))
+        waiting = []
+        for process, connection, started in running.values():
+            waiting += [connection, process.sentinel]
+        ready = wait(waiting, timeout)
+        if not ready:
+            break
+        k = [k for k, (process, connection, started) in running.items()
+            if connection in ready or process.sentinel in ready][0]
+        process, connection, started = running.pop(k)
+        result = receive(connection)
+        connection.close()
+        process.join()
+        if result is None:
+            runs.append({"k": k, "solved": None, "cancelled": False, "crashed": True, "time": time.time() - started})
+            continue
+        runs.append({"k": k, "solved": result["solved"], "complete": result["complete"], "cancelled": False,
+            "time": result["stats"]["time"]})
+
+        if result["solved"]:
+            upper = k
+            coloring = result["coloring"]
+            for other in [o for o in running if o >= k]:
+                cancel(other)
+            candidates = [c for c in candidates if c < k]
+        elif result["complete"]:
+            infeasible = max(infeasible, k)
+            for other in [o for o in running if o <= k]:
+                cancel(other)
+            candidates = [c for c in candidates if c > k]
+
+    for k in list(running):
+        cancel(k)
+
+    wall_time = time.time() - start
+    sequential_time = sum(run["time"] for run in runs if not run["cancelled"] and not run.get("crashed"))
+    lower = infeasible + 1
+    return {
+        "chromatic_number": upper if lower == upper else None,
+        "lower_bound": lower,
+        "upper_bound": upper,
+        "coloring": coloring,
+        "runs": sorted(runs, key=lambda run: run["k"]),
+        "wall_time": wall_time,
+        "sequential_time": sequential_time,
+        "time_saved": sequential_time - wall_time,
+    }
+
+#The result a run sent through connection, None if the run died without one
+def receive(connection):
+    if not connection.poll():
+        return None
+    try:
+        return connection.recv()
+    except EOFError:
+        return None
+
+#Worker process. Solves the graph for k and sends the result through connection.
+def run_k(graph, k, solve_options, connection):
+    connection.send(solver.solve(graph, k, **solve_options))
+    connection.close()
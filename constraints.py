@@ -0,0 +1,232 @@
+import itertools
+
+#Simple Constraint object containing function and the variables
+#involved in the constraint. A constraint function is meaningless
+#unless the variables is known.
+#The general constraint is revised by searching for supports in the cross
+#product of the other variables' domains. Subclasses for common constraints
+#override revise with dedicated propagators, but keep a function so they
+#can still be evaluated as a general constraint.
+class Constraint(object):
+    #Relative cost of a revise, used to order the propagation queue
+    cost = 3
+    #If a support matrix can be used by revise. Constraints with
+    #dedicated propagators don't need one.
+    matrix = True
+    #Largest number of value pairs a support matrix is built for
+    matrix_limit = 4096
+
+    def __init__(self, constraint, variables):
+        self.function = constraint
+        self.variables = variables
+        #Residual supports (AC-3rm). Maps (variable, value) to the last
+        #tuple of values, in variables order, found to satisfy the constraint.
+        #Residues are only hints that are checked against the current domains
+        #before use, so they can be shared by every instance and stay valid
+        #across copies and backtracking.
+        self.residues = {}
+        #Support matrix for binary constraints, see compile
+        self.supports = None
+
+    #Precompute the support matrix of a binary constraint over finite domains.
+    #For each variable, row i is a bitmask over the other variable's value
+    #indices, with the bits set for the values compatible with value i.
+    #domain is the network's dict of domains. The indices follow the order of
+    #the values in the domains, like the DomainStore labels.
+    def compile(self, domain):
+        self.supports = None
+        if not self.matrix or len(self.variables) != 2:
+            return
+        a, b = self.variables
+        if a == b or a not in domain or b not in domain:
+            return
+        values_a = domain[a]
+        values_b = domain[b]
+        if len(values_a)*len(values_b) > self.matrix_limit:
+            return
+        rows_a = [0]*len(values_a)
+        rows_b = [0]*len(values_b)
+        for i, x in enumerate(values_a):
+            for j, y in enumerate(values_b):
+                if self.function(x, y):
+                    rows_a[i] |= 1 << j
+                    rows_b[j] |= 1 << i
+        self.supports = {a: rows_a, b: rows_b}
+
+    #The general revise method will potentially restrict
+    #v's domain after testing the domain against the constraint.
+    #The constraint can involve n non_focal variables. This is ok,
+    #since v domain is tested against the cross product of the non_focal variables'
+    #domains. Returns true if v's domain was reduced.
+    def revise(self, instance, v):
+        revised = False
+        constraint = self.function
+        store = instance.domain
+        variables = self.variables
+        residues = self.residues
+        checks = 0
+        domains = []
+
+        if self.supports is not None:
+            return self.revise_matrix(instance, v)
+
+        #The domains of all variables involved in constraint is added to a list,
+        #with v's own domain replaced by the focal value during the scan.
+        for vi in variables:
+            domains.append(store.values(vi))
+        focal_position = variables.index(v)
+
+        #Each value in v's domain has to be tested, to see if it deserves to be
+        #retained in the domain. The domain is immutable, so removing values
+        #while iterating is safe.
+        for focal_value in store.values(v):
+            #The residue is rechecked first. If all its values are still in
+            #the domains it's still a support and no scan is needed.
+            residue = residues.get((v, focal_value))
+            checks += 1
+            if residue is not None and self.is_valid(store, residue):
+                continue
+
+            #Retain focal_value if some non_focal combination
+            #satisfies the constraint. The scan stops at the first support,
+            #which is stored as residue for every value in it.
+            domains[focal_position] = (focal_value,)
+            support = None
+            for combination in itertools.product(*domains):
+                checks += 1
+                if constraint(*combination):
+                    support = combination
+                    break
+            if support is None:
+                revised = True
+                store.remove(v, focal_value)
+            else:
+                for vi, value in zip(variables, support):
+                    residues[(vi, value)] = support
+        if instance.stats is not None:
+            instance.stats.checks += checks
+        #If values has been removed from v's domain true is returned.
+        #Important since the now smaller domain of v might have an impact on other
+        #variables connected to v through constraints
+        return revised
+
+    #Revise using the support matrix. A value is retained if its row share
+    #a bit with the other variable's domain mask, one AND per value
+    #instead of calling the function for each pair of values.
+    def revise_matrix(self, instance, v):
+        revised = False
+        store = instance.domain
+        rows = self.supports[v]
+        index = store.index[v]
+        other_mask = store.mask(self.other(v))
+        values = store.values(v)
+        if instance.stats is not None:
+            instance.stats.checks += len(values)
+        for value in values:
+            if not rows[index[value]] & other_mask:
+                store.remove(v, value)
+                revised = True
+        return revised
+
+    #True if every value of the tuple is still in its variable's domain
+    def is_valid(self, store, values):
+        for vi, value in zip(self.variables, values):
+            if not store.contains(vi, value):
+                return False
+        return True
+
+    def other(self, v):
+        if v == self.variables[0]:
+            return self.variables[1]
+        return self.variables[0]
+
+
+#a != b. A value of v only loses its support when the other variable's
+#domain is reduced to that single value, so the revise is O(1).
+class NotEqual(Constraint):
+    cost = 0
+    matrix = False
+
+    def __init__(self, a, b):
+        super().__init__(lambda x, y: x != y, [a, b])
+
+    def revise(self, instance, v):
+        store = instance.domain
+        other = self.other(v)
+        if instance.stats is not None:
+            instance.stats.checks += 1
+        if store.is_singleton(other):
+            return store.remove(v, store.value(other))
+        return False
+
+
+#a == b. v's domain is restricted to the values also found in the other
+#variable's domain, O(d).
+class Equal(Constraint):
+    cost = 1
+    matrix = False
+
+    def __init__(self, a, b):
+        super().__init__(lambda x, y: x == y, [a, b])
+
+    def revise(self, instance, v):
+        store = instance.domain
+        other = self.other(v)
+        revised = False
+        values = store.values(v)
+        if instance.stats is not None:
+            instance.stats.checks += len(values)
+        for value in values:
+            if not store.contains(other, value):
+                store.remove(v, value)
+                revised = True
+        return revised
+
+
+#All variables take different values. The values of fixed variables are
+#removed from v's domain. In addition the constraint fails if the variables
+#together have fewer values left than there are variables (pigeonhole),
+#which pairwise != constraints can't detect.
+#When all variables have the same initial domain, the value indices mean the
+#same for all of them, and the values left are counted by or-ing the domain
+#masks instead of collecting the values in a set.
+class AllDifferent(Constraint):
+    cost = 2
+    matrix = False
+
+    def __init__(self, variables):
+        super().__init__(lambda *values: len(set(values)) == len(values), list(variables))
+        self.same_domains = False
+
+    def compile(self, domain):
+        super().compile(domain)
+        first = domain.get(self.variables[0])
+        self.same_domains = first is not None and all(domain.get(v) == first for v in self.variables)
+
+    def revise(self, instance, v):
+        store = instance.domain
+        revised = False
+        if instance.stats is not None:
+            instance.stats.checks += len(self.variables)
+        if self.same_domains:
+            available = 0
+            for other in self.variables:
+                if other != v and store.is_singleton(other):
+                    revised = store.remove(v, store.value(other)) or revised
+                available |= store.mask(other)
+            count = available.bit_count()
+        else:
+            available = set()
+            for other in self.variables:
+                if other == v:
+                    continue
+                if store.is_singleton(other):
+                    revised = store.remove(v, store.value(other)) or revised
+                available.update(store.values(other))
+            available.update(store.values(v))
+            count = len(available)
+        if count < len(self.variables):
+            for value in store.values(v):
+                store.remove(v, value)
+            revised = True
+        return revised
@@ -10,9 +10,12 @@ from collections import deque
 class GraphDisplay(Canvas):
     cWi = 600
     cHi = 400
+    #Most timeslices waiting to be drawn. When the search runs ahead of the
+    #display the oldest timeslices are dropped.
+    max_queue = 1000
 
     def __init__(self, parent):
-        self.queue = deque([])
+        self.queue = deque([], self.max_queue)
         self.model = None
         self.width = self.cWi
         self.height = self.cHi
@@ -0,0 +1,299 @@
+import random
+
+#Backtrackable store for the domains of a ConstraintInstance.
+#Each domain is kept as an immutable value, and a change replaces the
+#value instead of altering it. A copy of the store is therefore only a
+#shallow copy of the dict, where parent and child share every domain the
+#child has not reduced itself. Every change is recorded on a trail (undo log)
+#as a (variable, old domain) pair. The trail is the delta between the store
+#and the state it was copied from, and can be used to undo changes back
+#to an earlier mark.
+#The DomainStore keep each domain as a tuple of values. Subclasses can
+#change the encoding by overriding encode, decode and the query methods.
+class DomainStore(object):
+    #Seed for the Zobrist keys, fixed so hashes are reproducible
+    seed = 0
+
+    #order is the variables in the order used for the size buckets,
+    #by default the order of the domain dict.
+    def __init__(self, domain, order=None):
+        #labels hold the initial domain of each variable. The position of
+        #a value in labels is the value's index, used by encodings and
+        #constraints that work on indices instead of values.
+        self.labels = {}
+        self.index = {}
+        self.domains = {}
+        self.trail = []
+        #Counters kept up to date on every change, so the size, emptiness
+        #and solution checks of the whole store are O(1)
+        self.total = 0
+        self.empty = 0
+        self.unfixed = 0
+        #Zobrist hashing. Every (variable, value index) pair has a random key,
+        #and the hash of the store is the xor of the keys of all values
+        #left in the domains. Removing a value xor its key out again, so the
+        #hash is kept up to date incrementally as the domains shrink.
+        self.keys = {}
+        self.hash = 0
+        #Size buckets. Each variable has a position in order, and
+        #buckets[size] is a bitmask over the positions of the variables whose
+        #domain has that size. The buckets move with every change, so the
+        #smallest domain is found without looking at every variable, and a copy
+        #only cost one int per possible size.
+        self.order = list(order or domain)
+        self.position = dict((v, i) for i, v in enumerate(self.order))
+        self.buckets = [0]*(max([len(d) for d in domain.values()] or [0]) + 1)
+        generator = random.Random(self.seed)
+        for v, d in domain.items():
+            labels = tuple(d)
+            self.labels[v] = labels
+            self.index[v] = dict((value, i) for i, value in enumerate(labels))
+            self.keys[v] = tuple(generator.getrandbits(64) for value in labels)
+            encoded = self.encode(v, labels)
+            self.domains[v] = encoded
+            self.hash ^= self.zobrist(v, self.mask_of(v, encoded))
+            size = self.size_of(encoded)
+            self.total += size
+            if size == 0:
+                self.empty += 1
+            if size != 1:
+                self.unfixed += 1
+            self.buckets[size] |= 1 << self.position[v]
+
+    #A child store share the domains of the parent until they are changed.
+    #The trail of the child starts empty, and only record the child's own changes.
+    def copy(self):
+        child = object.__new__(self.__class__)
+        child.__dict__.update(self.__dict__)
+        child.domains = dict(self.domains)
+        child.buckets = list(self.buckets)
+        child.trail = []
+        return child
+
+    #Converts an iterable of values into the stored representation
+    def encode(self, v, values):
+        return tuple(values)
+
+    #Converts the stored representation into a tuple of values
+    def decode(self, v, encoded):
+        return encoded
+
+    def size_of(self, encoded):
+        return len(encoded)
+
+    #The bitmask over value indices of an encoded domain
+    def mask_of(self, v, encoded):
+        index = self.index[v]
+        m = 0
+        for value in encoded:
+            m |= 1 << index[value]
+        return m
+
+    #The xor of the Zobrist keys of v's values in the bitmask m
+    def zobrist(self, v, m):
+        keys = self.keys[v]
+        h = 0
+        while m:
+            low = m & -m
+            h ^= keys[low.bit_length()-1]
+            m ^= low
+        return h
+
+    #Updates the counters and buckets when v's domain change size.
+    def recount(self, v, old_size, new_size):
+        if old_size != new_size:
+            bit = 1 << self.position[v]
+            self.buckets[old_size] ^= bit
+            self.buckets[new_size] |= bit
+        self.total += new_size - old_size
+        if old_size == 0:
+            self.empty -= 1
+        if new_size == 0:
+            self.empty += 1
+        if old_size != 1:
+            self.unfixed -= 1
+        if new_size != 1:
+            self.unfixed += 1
+
+    #All changes to a domain goes through this method, so the
+    #old domain is recorded on the trail.
+    def replace(self, v, new):
+        old = self.domains[v]
+        self.trail.append((v, old))
+        self.domains[v] = new
+        self.recount(v, self.size_of(old), self.size_of(new))
+        self.hash ^= self.zobrist(v, self.mask_of(v, old) ^ self.mask_of(v, new))
+
+    def values(self, v):
+        return self.domains[v]
+
+    def size(self, v):
+        return len(self.domains[v])
+
+    def is_singleton(self, v):
+        return len(self.domains[v]) == 1
+
+    #The value of a singleton domain
+    def value(self, v):
+        return self.domains[v][0]
+
+    def contains(self, v, value):
+        return value in self.domains[v]
+
+    #The domain as a bitmask over the indices of the values.
+    def mask(self, v):
+        return self.mask_of(v, self.domains[v])
+
+    #Removes value from v's domain. Returns true if the domain was reduced.
+    def remove(self, v, value):
+        domain = self.domains[v]
+        if value not in domain:
+            return False
+        self.replace(v, tuple(d for d in domain if d != value))
+        return True
+
+    #Reduce v's domain to a single value, typically when an assumption is made.
+    def assign(self, v, value):
+        self.replace(v, self.encode(v, (value,)))
+
+    #True if any domain is empty
+    def has_empty(self):
+        return self.empty > 0
+
+    #True if every domain has exactly one value
+    def is_fixed(self):
+        return self.unfixed == 0
+
+    #The variables with a domain of the given size, as a bitmask over their
+    #positions in order.
+    def bucket(self, size):
+        if size < len(self.buckets):
+            return self.buckets[size]
+        return 0
+
+    #The variables in a bitmask of positions, lowest position first
+    def variables_in(self, m):
+        order = self.order
+        while m:
+            low = m & -m
+            yield order[low.bit_length()-1]
+            m ^= low
+
+    #The first variable, in order, of the smallest domain larger than one.
+    #None if all domains have one value or less.
+    def smallest_unfixed(self):
+        buckets = self.buckets
+        for size in range(2, len(buckets)):
+            m = buckets[size]
+            if m:
+                return self.order[(m & -m).bit_length()-1]
+        return None
+
+    #A key for the current state, hashed by the Zobrist hash.
+    def state_key(self):
+        return StateKey(self)
+
+    #A mark is a position on the trail, which the store can be restored to.
+    def mark(self):
+        return len(self.trail)
+
+    #Undo every change made after mark was taken, newest first.
+    def undo(self, mark):
+        trail = self.trail
+        while len(trail) > mark:
+            v, old = trail.pop()
+            new = self.domains[v]
+            self.recount(v, self.size_of(new), self.size_of(old))
+            self.hash ^= self.zobrist(v, self.mask_of(v, old) ^ self.mask_of(v, new))
+            self.domains[v] = old
+
+    #The variables changed since the store was copied from its parent,
+    #with their current domain.
+    def delta(self):
+        changes = {}
+        for v, old in self.trail:
+            changes[v] = self.values(v)
+        return changes
+
+    #A plain dict of lists, decoupled from the store.
+    def materialize(self):
+        domain = {}
+        for v in self.domains:
+            domain[v] = list(self.values(v))
+        return domain
+
+
+#Domain store where each domain is an integer bitmask over the indices of
+#the variable's initial values. Size, singleton and emptiness checks are
+#a few integer operations, and a copy only cost one int per variable.
+#Best suited for small domains, like the colors in vertex coloring.
+class BitmaskDomainStore(DomainStore):
+
+    def encode(self, v, values):
+        index = self.index[v]
+        m = 0
+        for value in values:
+            m |= 1 << index[value]
+        return m
+
+    def decode(self, v, encoded):
+        labels = self.labels[v]
+        values = []
+        while encoded:
+            low = encoded & -encoded
+            values.append(labels[low.bit_length()-1])
+            encoded ^= low
+        return tuple(values)
+
+    def size_of(self, encoded):
+        return encoded.bit_count()
+
+    def mask_of(self, v, encoded):
+        return encoded
+
+    def values(self, v):
+        return self.decode(v, self.domains[v])
+
+    def size(self, v):
+        return self.domains[v].bit_count()
+
+    def is_singleton(self, v):
+        m = self.domains[v]
+        return m != 0 and m & (m-1) == 0
+
+    def value(self, v):
+        return self.labels[v][self.domains[v].bit_length()-1]
+
+    def contains(self, v, value):
+        i = self.index[v].get(value)
+        return i is not None and self.domains[v] >> i & 1 == 1
+
+    def mask(self, v):
+        return self.domains[v]
+
+    def remove(self, v, value):
+        i = self.index[v].get(value)
+        m = self.domains[v]
+        if i is None or not m >> i & 1:
+            return False
+        self.replace(v, m & ~(1 << i))
+        return True
+
+
+#Identifies the state of a store in dicts and sets. The hash is the store's
+#Zobrist hash, so hashing is O(1), and the domains are only compared in
+#full when two keys have the same hash. The key refers to the store's
+#domains instead of copying them, and is only meant for stores that are no
+#longer changed, like the instance of a generated GacNode.
+class StateKey(object):
+    __slots__ = ("hash", "domains")
+
+    def __init__(self, store):
+        self.hash = store.hash
+        self.domains = store.domains
+
+    def __hash__(self):
+        return self.hash
+
+    def __eq__(self, other):
+        return self.hash == other.hash and self.domains == other.domains
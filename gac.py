@@ -1,7 +1,11 @@
-from copy import deepcopy
 from collections import deque
-import itertools
+from enum import Enum
+import heapq
+import time
 from abstractnode import Node
+from domain import DomainStore
+from constraints import Constraint, NotEqual, Equal, AllDifferent
+from ordering import MinDomain
 
 #The ConstraintNetwork object contain the domain, variables
 #and constraints defining a problem. To utilize 
@@ -20,6 +24,23 @@ class ConstraintNetwork(object):
         self.domain = {}
         self.constraints = {}
         self.unique_constraints = [] #Only unique constrains put in list
+        #Order revise requests are taken from the propagation queue
+        self.queue_order = QueueOrder.FIFO
+        #How strong domain_filtering propagates, see Consistency
+        self.consistency = Consistency.AC
+        #Heuristic choosing the variable of the next assumption, see ordering.py
+        self.ordering = MinDomain()
+        #True if the values can be swapped for each other in any solution,
+        #like the colors in vertex coloring. Assumptions then skip values
+        #that are symmetric to one already tried, see branch_values.
+        self.interchangeable_values = False
+        #Optional NogoodStore, see nogoods.py. Successors are then checked
+        #against the nogoods, and failed successors recorded as nogoods. The
+        #instances have to be made with nogoods.LearningInstance.
+        self.nogoods = None
+        #Optional Stats object, shared by all instances of the network.
+        #None means no counting.
+        self.stats = None
 
     #Add a new variable to the network
     #All variables should also have a domain
@@ -40,22 +61,38 @@ class ConstraintNetwork(object):
     #function is then associated with each of the variables in 
     #the variable_list
     def add_constraint(self, variable_list, expression):
-        for potential_var in variable_list:
-            self.check_variable(potential_var)
-
         constraint_function = self.makefunc(variable_list, expression)
-        constraint = Constraint(constraint_function, variable_list)
+        self.add(Constraint(constraint_function, variable_list))
+
+    #Typed constraints. These are revised by dedicated propagators
+    #instead of testing a lambda against every combination of values.
+    def add_not_equal(self, a, b):
+        self.add(NotEqual(a, b))
+
+    def add_equal(self, a, b):
+        self.add(Equal(a, b))
+
+    def add_all_different(self, variable_list):
+        self.add(AllDifferent(variable_list))
+
+    #Adds a constraint object to the network. Binary constraints over
+    #small domains get their support matrix precomputed here.
+    def add(self, constraint):
+        for potential_var in constraint.variables:
+            self.check_variable(potential_var)
+        constraint.compile(self.domain)
 
         #Add the constraint to each variable part of the expression
         #The expressions associated with a variable can easily be retrieved
-        for variable in variable_list:
+        for variable in constraint.variables:
             self.constraints[variable].append(constraint)
 
         self.unique_constraints.append(constraint)
     
-    #Check if variable is actually in network
+    #Check if variable is actually in network. Every variable has a list
+    #in the constraints dict, so the check is O(1).
     def check_variable(self, v):
-        if v not in self.variables:
+        if v not in self.constraints:
             raise Exception("Variable " + str(v) + " not found in network")
 
     #Checks if domain is set
@@ -71,6 +108,9 @@ class ConstraintNetwork(object):
         self.check_variable(v)
         self.check_domain(d)
         self.domain[v] = d
+        #Support matrices depend on the domains, and are rebuilt
+        for c in self.constraints[v]:
+            c.compile(self.domain)
 
     #Returns all constraints that involve the variable v.
     #Can be used to see how many constraints an variable is
@@ -80,9 +120,14 @@ class ConstraintNetwork(object):
 
     #Creates a ConstraintInstance containing pointer to
     #the variables and the full constraint network. The 
-    #domain is copied, since it's typically restriced.
-    def create_instance(self):
-        return ConstraintInstance(self, self.variables, self.domain)
+    #domain is copied into a DomainStore, since it's typically restriced.
+    #store_class select the domain representation, BitmaskDomainStore is
+    #faster for small domains of values. instance_class is the
+    #ConstraintInstance class to create, see backtrack.py.
+    def create_instance(self, store_class=DomainStore, instance_class=None):
+        order = self.ordering.index_order(self)
+        instance_class = instance_class or ConstraintInstance
+        return instance_class(self, self.variables, store_class(self.domain, order))
 
     #Converts a string expression to a full fledged function!
     def makefunc(self,var_names, expression, envir=globals()):
@@ -92,91 +137,91 @@ class ConstraintNetwork(object):
         return eval( "(lambda " + args[1:] + ": " + expression + ") " , envir)
 
 
-#Simple Constraint object containing function and the variables
-#involved in the constraint. A constraint function is meaningless
-#unless the variables is known. 
-class Constraint(object):
-    def __init__(self, constraint, variables):
-        self.function = constraint
-        self.variables = variables
-
-
 #The constraintInstance is a restricted instance of the ConstraintNetwork object
-#It has pointers to the constraints and copies of the potentially restricted
-#domains.
+#It has pointers to the constraints and a DomainStore with the potentially
+#restricted domains. The store is either given or built from a dict of lists.
 class ConstraintInstance(object):
     def __init__(self, network, v,d):
-        self.queue = deque()
+        self.queue = PropagationQueue(network.queue_order)
         self.variables = v
-        self.domain = deepcopy(d)
+        if not isinstance(d, DomainStore):
+            d = DomainStore(d)
+        self.domain = d
         self.cnet = network
-
-    #The general revise method will potentially restrict
-    #v's domain after testing the domain against the constraint
-    #c. The constraint can involve n non_focal variables. This is ok,
-    #since v domain is tested against the cross product of the non_focal variables'
-    #domains. 
+        self.stats = network.stats
+        #True while singleton checks are made, so the propagation of a
+        #probe doesn't start singleton checks of its own
+        self.probing = False
+        #True while a probe is propagated. Its removals are undone, and not
+        #counted as pruned.
+        self.tentative = False
+
+    #Revise v's domain with the constraint c. The constraint decides how,
+    #the general Constraint test v's values against the cross product of
+    #the other variables' domains, while NotEqual and the other typed
+    #constraints use dedicated propagators.
+    #If values has been removed from v's domain true is returned.
     def revise(self, v, c):
-        revised = False
-        constraint = c.function
-        domains = []
-
-        #The domains of all variables involved in constraint is added to a list
-        #expect v's domain.
-        for vi in c.variables:
-            if vi != v:
-                domains.append(self.domain[vi])
-        
-        #Each value in v's domain has to be tested, to see if it deserves to be 
-        #retained in the domain.
-        for focal_value in self.domain[v]:
-            retain = False
-            for non_focal in itertools.product(*domains):
-                #Retrain focal_value if for some non_focal combination
-                #satisfies the constraint. If there does not exist such
-                #a combination, it will be removed from v's domain
-                
-                if constraint(focal_value, *non_focal):
-                    retain = True
-            if not retain:
-                revised = True
-                self.domain[v].remove(focal_value)
-        #If values has been removed from v's domain true is returned.
-        #Important since the now smaller domain of v might have an impact on other
-        #variables connected to v through constraints
+        stats = self.stats
+        if stats is None:
+            return c.revise(self, v)
+        before = self.domain.total
+        revised = c.revise(self, v)
+        stats.revisions += 1
+        if not self.tentative:
+            stats.pruned += before - self.domain.total
         return revised
 
-    #Makes a copy of itself where the variables domains are deepcopied.
-    #Used when generating successors.
+    #Makes a copy of itself sharing the parent's domains until they are
+    #reduced. Used when generating successors.
     def copy_object(self):
-        return ConstraintInstance(self.cnet, self.variables, self.domain)
+        if self.stats is not None:
+            self.stats.copies += 1
+        return ConstraintInstance(self.cnet, self.variables, self.domain.copy())
+
+    #Assumes value for v, and propagates the assumption
+    def assume(self, v, value):
+        self.domain.assign(v, value)
+        self.rerun(v)
 
     #If any of the domains in the instance is empty, it becomes
     #contradictory and not worth persuing for a solution anymore.
     def is_contradictory(self):
-        for key, domain in self.domain.items():
-            if len(domain) == 0:
-                return True
-        return False
+        return self.domain.has_empty()
 
     def variable_contradictory(self, v):
-        if len(self.domain[v]) == 0:
+        if self.domain.size(v) == 0:
             return True
         return False
 
     #GAC heuristic. The choice of which node should be used
     #when making assumptions is important and has a big impact.
-    #The variable with the smallest domain but bigger than one is returned.
+    #The network's ordering heuristic picks the variable, by default
+    #the variable with the smallest domain but bigger than one.
+    #None is returned if all domains have one value.
     def get_next_assumption(self):
-    #TODO: Should find variable with most constraints attached?
-        smallest = float("inf")
-        small_variable = None
-        for v in self.variables:
-            domain_size = len(self.domain[v])
-            if domain_size<smallest and domain_size > 1:
-                smallest = domain_size
-                small_variable = v
-        return small_variable
+        return self.cnet.ordering.select(self)
+
+    #The values of v to make assumptions with. If the network's values are
+    #interchangeable, the values no fixed variable has are all symmetric, so
+    #only the first of them is tried, together with the values already used.
+    #Requires that constraints only remove values that are used, which holds
+    #for NotEqual and AllDifferent.
+    def branch_values(self, v):
+        store = self.domain
+        values = store.values(v)
+        if not self.cnet.interchangeable_values:
+            return values
+        used = set(store.value(u) for u in store.variables_in(store.bucket(1)))
+        branch = []
+        unused = False
+        for value in values:
+            if value in used:
+                branch.append(value)
+            elif not unused:
+                branch.append(value)
+                unused = True
+        return branch
 
     #The core of general arc consistency. The queue contains
     #tuples of variable constaint pairs to be tested by the revise algorithm
@@ -185,40 +230,114 @@ class ConstraintInstance(object):
     #further testing. This process will propagate domain change until 
     #the instance becomes stable and no more domain reduction is possible.
     def domain_filtering(self):
-        while self.queue:
-            variable, constraint = self.queue.popleft()
+        queue = self.queue
+        stats = self.stats
+        if stats is not None:
+            started = time.perf_counter()
+        while queue:
+            variable, constraint = queue.pop()
             reduced = self.revise(variable, constraint)
             if reduced:
                 if self.variable_contradictory(variable):
-                    return
+                    self.cnet.ordering.on_conflict(constraint)
+                    queue.clear()
+                    break
                 #If the domain is reduced, other domains might
                 #need be reduced because of constraint between 
                 #the current variable and other variables.
-                for c in self.cnet.get_constraints(variable):
-                    if c is not constraint:
-                        revise_request = (variable, c)
-                        self.queue.append(revise_request)
-                    for v in c.variables:
-                        if v is not variable:
-                            revise_request =(v, c)
-                            self.queue.append(revise_request)
-                
+                #The variable's own values keep their supports when its
+                #domain shrinks, so only the neighbors are revised.
+                self.add_neighbors_to_queue(variable)
+        if stats is not None:
+            stats.add_time("propagation", started)
+            stats.queue_pushes += queue.pushes
+            stats.revisions_avoided += queue.avoided
+        queue.pushes = 0
+        queue.avoided = 0
+        if self.cnet.consistency is not Consistency.AC and not self.probing and not self.is_contradictory():
+            self.singleton_filtering()
+
+    #Singleton arc consistency (SAC). Each value of each unfixed variable is
+    #probed: the variable is assumed to have the value, and the assumption
+    #propagated. A value whose probe wipes out a domain can't be part of a
+    #solution, and is removed. The probes are made in the instance's own store
+    #and undone from its trail, so no copies are made.
+    #RESTRICTED_SAC probes every value once. SAC probes again until a round
+    #removes nothing, since a removal can make other probes fail.
+    def singleton_filtering(self):
+        store = self.domain
+        stats = self.stats
+        full = self.cnet.consistency is Consistency.SAC
+        self.probing = True
+        changed = True
+        while changed:
+            changed = False
+            for v in self.variables:
+                if store.size(v) < 2:
+                    continue
+                for value in store.values(v):
+                    if not store.contains(v, value):
+                        continue
+                    if stats is not None:
+                        stats.probes += 1
+                    if not self.probe(v, value):
+                        self.prune(v, value)
+                        changed = True
+                        if self.is_contradictory():
+                            self.probing = False
+                            return
+            if not full:
+                break
+        self.probing = False
+
+    #True if assuming value for v propagates without wiping out a domain.
+    #The store is left as it was.
+    def probe(self, v, value):
+        mark = self.mark()
+        self.tentative = True
+        self.domain.assign(v, value)
+        self.rerun(v)
+        consistent = not self.is_contradictory()
+        self.tentative = False
+        self.undo(mark)
+        return consistent
+
+    #Removes a value that failed its probe, and propagates the removal
+    def prune(self, v, value):
+        self.domain.remove(v, value)
+        if self.stats is not None:
+            self.stats.pruned += 1
+        if not self.variable_contradictory(v):
+            self.add_neighbors_to_queue(v)
+            self.domain_filtering()
+
+    #A mark the instance can be undone to, see undo
+    def mark(self):
+        return self.domain.mark()
+
+    def undo(self, mark):
+        self.domain.undo(mark)
 
     #Helper method for adding all revise request combination for a variable v
     #constraints
     def add_constraints_to_queue(self, v):
         for c in self.cnet.get_constraints(v):
-            revise_request = (v, c)
-            self.queue.append(revise_request)
+            self.queue.push(v, c, self.domain)
+
+    #Helper method for adding the revise requests of the variables
+    #sharing a constraint with v, for that constraint.
+    def add_neighbors_to_queue(self, v):
+        for c in self.cnet.get_constraints(v):
+            for neighbor in c.variables:
+                if neighbor != v:
+                    self.queue.push(neighbor, c, self.domain)
 
     #Init the revise process. Puts all pairs of variable and constraint
     #in the queue. 
     def initialize(self):
         #Schedule a revise for all variables.
         for v in self.variables:
-            for c in self.cnet.get_constraints(v):
-                revise_request = (v, c)
-                self.queue.append(revise_request)
+            self.add_constraints_to_queue(v)
 
             
     #Given that an assumption was made about a variable.
@@ -227,10 +346,7 @@ class ConstraintInstance(object):
     #For all constraints the assumption variable is a part of,
     #retrive other "neighbor" variables and add these to the queue 
     def rerun(self, assumption):
-        for c in self.cnet.get_constraints(assumption):
-            for v in c.variables:
-                if v is not assumption:
-                    self.add_constraints_to_queue(v)
+        self.add_neighbors_to_queue(assumption)
         self.domain_filtering()
 
     def count_unsatisfied_constraints(self):
@@ -238,7 +354,7 @@ class ConstraintInstance(object):
         for c in self.cnet.unique_constraints:
             satisfied = True
             for c_v in c.variables:
-                if len(self.domain[c_v]) != 1:
+                if not self.domain.is_singleton(c_v):
                     satisfied = False
             if not satisfied:
                 unsatisfied += 1
@@ -248,12 +364,87 @@ class ConstraintInstance(object):
         output =""
         for v in self.variables:
             output += str(v) + ": "
-            for d in self.domain[v]:
+            for d in self.domain.values(v):
                 output += str(d) + ", "
             output +="\n"
         return output + "\n"
 
 
+#Queue of (variable, constraint) revise requests for domain_filtering.
+#A request already waiting in the queue is not added again, the pending
+#requests are kept in a set so the check is O(1). Skipped requests are
+#counted in avoided, and added ones in pushes. By default requests are revised in FIFO order, the
+#other QueueOrder modes keep the queue as a heap.
+class PropagationQueue(object):
+    def __init__(self, order=None):
+        self.order = order or QueueOrder.FIFO
+        self.pending = set()
+        self.pushes = 0
+        self.avoided = 0
+        self.counter = 0
+        if self.order is QueueOrder.FIFO:
+            self.requests = deque()
+        else:
+            self.requests = []
+
+    #Adds the revise request (v, c) unless it is already in the queue.
+    #The domain store is used to rank requests by domain size.
+    def push(self, v, c, store):
+        request = (v, c)
+        if request in self.pending:
+            self.avoided += 1
+            return
+        self.pending.add(request)
+        self.pushes += 1
+        order = self.order
+        if order is QueueOrder.FIFO:
+            self.requests.append(request)
+            return
+        if order is QueueOrder.SMALLEST_DOMAIN:
+            priority = store.size(v)
+        else:
+            priority = c.cost
+        #The counter keep requests with equal priority in FIFO order, and
+        #avoids comparing the constraints.
+        self.counter += 1
+        heapq.heappush(self.requests, (priority, self.counter, request))
+
+    def pop(self):
+        if self.order is QueueOrder.FIFO:
+            request = self.requests.popleft()
+        else:
+            request = heapq.heappop(self.requests)[2]
+        self.pending.discard(request)
+        return request
+
+    def clear(self):
+        self.requests.clear()
+        self.pending.clear()
+
+    def __len__(self):
+        return len(self.requests)
+
+
+#The order revise requests are taken from the propagation queue.
+#FIFO is the plain queue. SMALLEST_DOMAIN revise the variable with the
+#smallest domain first, when the request was made. CHEAPEST_CONSTRAINT
+#revise constraints with cheap propagators first.
+class QueueOrder(Enum):
+    FIFO = 1
+    SMALLEST_DOMAIN = 2
+    CHEAPEST_CONSTRAINT = 3
+
+
+#How strong the propagation of domain_filtering is. AC is arc consistency.
+#RESTRICTED_SAC adds one round of singleton checks of every value, and SAC
+#repeats the rounds until no value is removed. The stronger levels remove
+#more values at each node, at the cost of a propagation per value checked.
+class Consistency(Enum):
+    AC = 1
+    RESTRICTED_SAC = 2
+    SAC = 3
+
+
 #GacNode extends the abstract Node class. The class therefore contains
 #all the method neccesary to run an a* search. 
 #    -generate_successors
@@ -269,6 +460,7 @@ class GacNode(Node):
     def __init__(self, instance, is_root=False):
         super().__init__()
         self.ci = instance
+        self.id = None
         if is_root:
             #If this is the rootnode in the search tree the constraint instance
             #domain has to be reduced before continueing.
@@ -281,40 +473,51 @@ class GacNode(Node):
     #Returns a list of successors where 1 variable has been assumed, generating
     #a successor for each of the values in the variables domain. Not added
     #if successor is contradictory (A domain has no values, no solution possible)
+    #With nogoods in the network, values that would make a nogood true are
+    #skipped before any propagation, and a contradictory successor is
+    #recorded as a nogood. If every value fails, the node itself is recorded.
     def generate_successors(self):
         successors = []
+        nogoods = self.ci.cnet.nogoods
+        failures = []
         v = self.ci.get_next_assumption()
         if v:
-            for value in self.ci.domain[v]:
+            values = self.ci.branch_values(v)
+            for value in values:
+                if nogoods is not None:
+                    nogood = nogoods.find(self.ci.domain, v, value)
+                    if nogood is not None:
+                        failures.append((value, nogood))
+                        continue
                 potential_instance = self.ci.copy_object()
-                potential_instance.domain[v] = [value]
-                potential_instance.rerun(v)
-                #After running rerun the constaint instance's domain
+                potential_instance.assume(v, value)
+                #After the assumption the constaint instance's domain
                 #has been reduced and hopefully not contradictory.
                 #The rerun does inferences on the domains using constraints.
                 if not potential_instance.is_contradictory():
                     successors.append(GacNode(potential_instance))
+                elif nogoods is not None:
+                    nogood = potential_instance.nogood()
+                    nogoods.record(nogood)
+                    failures.append((value, nogood))
+            if nogoods is not None and not successors:
+                nogoods.record(self.ci.dead_end(v, len(values), failures))
         return successors
 
     #search heuristic based on the total size of the instance variable domains
     #Possible closer to a solution if more domains have been reduced. 
     #Not an admissable heuristic
     def calc_H(self):
-        domain_size = 0
-        for key, domain in self.ci.domain.items():
-            domain_size += len(domain)
-        return domain_size-1
+        return self.ci.domain.total-1
 
     #How the node id itself. The a-star can use the returned value to check
     #if node has been generated before or not, and avoids duplicates in the search
-    #tree
+    #tree. The id is made once, from the Zobrist hash the domain store keep
+    #up to date, and cached on the node.
     def generate_id(self):
-        unique = ""
-        for key, domain in self.ci.domain.items():
-            for value in domain:
-                unique += str(value) + ","
-            unique +=":"
-        return unique
+        if self.id is None:
+            self.id = self.ci.domain.state_key()
+        return self.id
 
     #arc_cost the same between all GacNodes.
     def arc_cost(self, child):
@@ -324,10 +527,7 @@ class GacNode(Node):
     #been reduced exactly to the size of one. If this has happened
     #a solution has been found.  
     def is_solution(self):
-        for key, domain in self.ci.domain.items():
-            if(len(domain) is not 1):
-                return False
-        return True
+        return self.ci.domain.is_fixed()
 
     #The display add tuples to a list containing name of variable
     #and a the chosen value. If the domain has not yet been reduced to 1
@@ -335,11 +535,11 @@ class GacNode(Node):
     def gui_representation(self, generated, popped):
         data = {}
         value_reduction = []
-        for key, domain in self.ci.domain.items():
-            if len(domain) == 1:
-                value_reduction.append((key, domain[0]))
+        for v in self.ci.variables:
+            if self.ci.domain.is_singleton(v):
+                value_reduction.append((v, self.ci.domain.value(v)))
             else:
-                value_reduction.append((key, -1))
+                value_reduction.append((v, -1))
         data["values"] = value_reduction
         data["generated"] = generated
         data["popped"] = popped
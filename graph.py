@@ -1,3 +1,5 @@
+import loader
+
 #Simple object representation of a graph. 
 #The GraphModel object constitute of NodeModel's
 #and EdgeModel's. Object used as display model,
@@ -8,6 +10,11 @@ class GraphModel(object):
     def __init__(self):
         self.vertices = {}
         self.edges = []
+        #Bounding box of the vertex coordinates, always including origo
+        self.max_x = 0
+        self.max_y = 0
+        self.min_x = 0
+        self.min_y = 0
 
     def __repr__(self):
         nodes = ""
@@ -20,6 +27,10 @@ class GraphModel(object):
 
     def add_vertex(self, node):
         self.vertices[node.id] = node
+        if self.max_x < node.x: self.max_x = node.x
+        if self.max_y < node.y: self.max_y = node.y
+        if self.min_x > node.x: self.min_x = node.x
+        if self.min_y > node.y: self.min_y = node.y
 
 
     def get_vertex(self, id):
@@ -30,6 +41,8 @@ class NodeModel(object):
     def __init__(self, id, x,y):
         #Will use this for dicts and lambdas
         self.id = "N" + str(id)
+        #The vertex number used in the input file
+        self.number = id
         self.x = x
         self.y = y
 
@@ -37,4 +50,31 @@ class EdgeModel(object):
 
     def __init__(self, node1, node2):
         self.sp = node1
-        self.ep = node2
\ No newline at end of file
+        self.ep = node2
+
+
+#Reads a graph from a problem file. The first line holds the number of
+#vertices and edges. Then follows one line per vertex with id, x and y,
+#and one line per edge with the ids of the two vertices it connects.
+#Does not depend on the GUI, so graphs can be loaded without a display.
+def read_graph(problem_file):
+    return graph_from_arrays(loader.parse(problem_file.read()))
+
+#Builds a GraphModel from the GraphArrays of loader.py
+def graph_from_arrays(arrays):
+    graphModel = GraphModel()
+    nodes = []
+    for number, x, y in zip(arrays.numbers, arrays.x, arrays.y):
+        nodeModel = NodeModel(number, x, y)
+        graphModel.add_vertex(nodeModel)
+        nodes.append(nodeModel)
+    edges = arrays.edges
+    for i in range(0, len(edges), 2):
+        graphModel.add_edge(EdgeModel(nodes[edges[i]], nodes[edges[i+1]]))
+    return graphModel
+
+#Convenience method for reading a graph from a file name. The file is
+#parsed in bulk by loader.py, and with cache set a binary cache of the
+#parsed file is kept next to it.
+def load_graph(filename, cache=False):
+    return graph_from_arrays(loader.load(filename, cache))
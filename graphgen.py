@@ -0,0 +1,85 @@
+import argparse
+import math
+import random
+import sys
+
+#Generates synthetic graphs in the same text format as the files in input/,
+#for measuring how the solver scales with the size of the graph.
+#    python graphgen.py geometric 1000 --radius 0.05 -o input/geo-1000.txt
+#    python graphgen.py spiral 5000 -o input/spiral-5000.txt
+
+#Random geometric graph. n points are placed uniformly in a square, and two
+#points are connected if they are closer than radius, relative to the side
+#of the square. The points are bucketed in a grid of radius sized cells, so
+#only points in neighboring cells are compared.
+def random_geometric(n, radius, seed=0, side=100.0):
+    generator = random.Random(seed)
+    points = [(generator.random(), generator.random()) for i in range(n)]
+    cells = {}
+    for i, (x, y) in enumerate(points):
+        cells.setdefault((int(x/radius), int(y/radius)), []).append(i)
+
+    edges = []
+    for i, (x, y) in enumerate(points):
+        cx = int(x/radius)
+        cy = int(y/radius)
+        for dx in (-1, 0, 1):
+            for dy in (-1, 0, 1):
+                for j in cells.get((cx+dx, cy+dy), ()):
+                    if j > i and (points[j][0]-x)**2 + (points[j][1]-y)**2 < radius**2:
+                        edges.append((i, j))
+    return [(x*side, y*side) for x, y in points], edges
+
+#Spiral graph, like spiral-500-4-color1.txt. The points follow an
+#archimedean spiral out from the center, and each point is connected to the
+#point before it and to one of the two points before that, about two edges
+#per vertex.
+def spiral(n, seed=0, turn=0.3, spacing=1.0):
+    generator = random.Random(seed)
+    points = []
+    for i in range(n):
+        angle = i*turn
+        distance = 1.0 + spacing*angle
+        points.append((50.0 + distance*math.cos(angle), 50.0 + distance*math.sin(angle)))
+
+    edges = []
+    for i in range(1, n):
+        edges.append((i, i-1))
+        if i > 2:
+            edges.append((i, i-generator.choice((2, 3))))
+    return points, edges
+
+#Writes the graph in the input/ format. The header holds the number of
+#vertices and edges, followed by one line per vertex and one per edge.
+def write_graph(out, points, edges):
+    out.write(str(len(points)) + " " + str(len(edges)) + "\n")
+    for i, (x, y) in enumerate(points):
+        out.write(str(i) + " " + repr(round(x, 4)) + " " + repr(round(y, 4)) + "\n")
+    for a, b in edges:
+        out.write(str(a) + " " + str(b) + "\n")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate graphs in the input/ format")
+    parser.add_argument("kind", choices=["geometric", "spiral"])
+    parser.add_argument("n", type=int, help="number of vertices")
+    parser.add_argument("--radius", type=float, default=None,
+        help="connection radius of geometric graphs, defaults to about 6 neighbors per vertex")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("-o", "--output", default=None, help="file to write, defaults to stdout")
+    args = parser.parse_args(argv)
+
+    if args.kind == "geometric":
+        radius = args.radius or math.sqrt(6.0/(math.pi*args.n))
+        points, edges = random_geometric(args.n, radius, args.seed)
+    else:
+        points, edges = spiral(args.n, args.seed)
+
+    if args.output:
+        with open(args.output, "w") as out:
+            write_graph(out, points, edges)
+    else:
+        write_graph(sys.stdout, points, edges)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,7 +1,7 @@
 from tkinter import *
 from tkinter import ttk, filedialog, messagebox
 from display import GraphDisplay
-from graph   import GraphModel, NodeModel, EdgeModel
+from graph   import read_graph
 from gac import ConstraintNetwork, GacNode
 from vertexcoloring import *
 from search import *
@@ -142,7 +142,9 @@ def run_gac(*args, k=4):
         padding = app.visualizer.padding
         app.visualizer.draw_label("K = " + str(k), padding*2,padding*2)
         app.visualizer.start()
-        astar = Search(app.visualizer)
+        #Only the latest node is drawn, a few times a second, so the search
+        #isn't slowed down to the speed of the display
+        astar = Search(app.visualizer, event_mode=EventMode.LATEST)
         result_node = astar.search(start_node, SearchMode.BEST)
         app.visualizer.stop()
         print("FINISHED")
@@ -175,36 +177,9 @@ def open_problem(*args):
 #and converts input data to objects which will be used to setup the a*-gac
 def init_display(problem_file):
     app.visualizer.reset()
-    temp = problem_file.readline().split()
-    nr_vertices = eval(temp[0])
-    nr_edges = eval(temp[1])
-    max_x = 0
-    max_y = 0
-    min_x = 0
-    min_y = 0
-    graphModel = GraphModel()
-
-    #The vertices are read in first from file, and the min and max of coordinates are registered
-    for l in range(nr_vertices):
-        vertex = problem_file.readline().split()
-        x = float(vertex[1])
-        y = float(vertex[2])
-        nodeModel = NodeModel( int(vertex[0]) , x , y )
-        graphModel.add_vertex(nodeModel)
-
-        if max_x < x: max_x = x
-        if max_y < y: max_y = y
-        if min_x > x: min_x = x
-        if min_y > y: min_y = y
-
-    #The edges are read and the vertices it connects put into an edgemodel
-    for e in range(nr_edges):
-        edge = problem_file.readline().split()
-        edgeModel = EdgeModel(graphModel.get_vertex("N" + str(edge[0])), graphModel.get_vertex("N" + str(edge[1]) ))
-        graphModel.add_edge(edgeModel)
-
+    graphModel = read_graph(problem_file)
     problem_file.close()
-    app.visualizer.set_dimension(max_x, max_y, min_x, min_y)
+    app.visualizer.set_dimension(graphModel.max_x, graphModel.max_y, graphModel.min_x, graphModel.min_y)
     return graphModel
 
 
@@ -0,0 +1,113 @@
+import os
+import struct
+from array import array
+
+#Fast loading of graph files into compact arrays. The whole file is read and
+#split at once, and the numbers are converted in bulk into typed arrays
+#instead of one object per vertex and edge:
+#    numbers - vertex ids from the file, int32
+#    x, y    - vertex coordinates, float64
+#    edges   - int32 pairs of vertex positions in numbers, flattened so
+#              edge i connects edges[2*i] and edges[2*i+1]
+#A binary cache of the arrays can be written next to the input file. It is
+#reused as long as the size and modification time of the input are unchanged.
+
+#Suffix of the binary cache files
+CACHE_SUFFIX = ".cache"
+
+#Magic, the size and modification time of the source file, and the number
+#of vertices and edges. The arrays follow in the order numbers, x, y, edges.
+#Everything is in native byte order, a cache is only read on the kind of
+#machine that wrote it.
+HEADER = struct.Struct("=8sqqqq")
+MAGIC = b"AGACGRF1"
+
+
+class GraphArrays(object):
+    def __init__(self, numbers, x, y, edges):
+        self.numbers = numbers
+        self.x = x
+        self.y = y
+        self.edges = edges
+
+    def vertex_count(self):
+        return len(self.numbers)
+
+    def edge_count(self):
+        return len(self.edges)//2
+
+
+#Parses the text of a graph file, str or bytes. The ids of the edges are converted to
+#positions in numbers, directly when the vertices are numbered 0 to n-1 in
+#order as in the input/ files, otherwise through a dict.
+def parse(data):
+    tokens = data.split()
+    nr_vertices = int(tokens[0])
+    nr_edges = int(tokens[1])
+    end = 2 + 3*nr_vertices
+    if len(tokens) < end + 2*nr_edges:
+        raise Exception("Graph file ends before " + str(nr_vertices) + " vertices and "
+            + str(nr_edges) + " edges")
+    numbers = array("i", map(int, tokens[2:end:3]))
+    x = array("d", map(float, tokens[3:end:3]))
+    y = array("d", map(float, tokens[4:end:3]))
+    edges = array("i", map(int, tokens[end:end + 2*nr_edges]))
+    if numbers != array("i", range(nr_vertices)):
+        position = dict((number, i) for i, number in enumerate(numbers))
+        edges = array("i", [position[number] for number in edges])
+    return GraphArrays(numbers, x, y, edges)
+
+
+def cache_name(filename):
+    return filename + CACHE_SUFFIX
+
+#Reads the cache of filename if it was written for the current version of
+#the file. Returns None if there is no usable cache.
+def read_cache(filename, source):
+    try:
+        with open(cache_name(filename), "rb") as cache:
+            header = cache.read(HEADER.size)
+            if len(header) != HEADER.size:
+                return None
+            magic, mtime, size, nr_vertices, nr_edges = HEADER.unpack(header)
+            if magic != MAGIC or mtime != source.st_mtime_ns or size != source.st_size:
+                return None
+            arrays = []
+            for typecode, length in (("i", nr_vertices), ("d", nr_vertices), ("d", nr_vertices), ("i", 2*nr_edges)):
+                values = array(typecode)
+                values.fromfile(cache, length)
+                arrays.append(values)
+            return GraphArrays(*arrays)
+    except (OSError, EOFError):
+        return None
+
+#Writes the cache for filename. The cache is written to a temporary file
+#first, so a cache is never left half written. Failing to write the cache
+#is not an error, the graph is just parsed again next time.
+def write_cache(filename, source, graph):
+    name = cache_name(filename)
+    temporary = name + ".tmp"
+    try:
+        with open(temporary, "wb") as cache:
+            cache.write(HEADER.pack(MAGIC, source.st_mtime_ns, source.st_size,
+                graph.vertex_count(), graph.edge_count()))
+            for values in (graph.numbers, graph.x, graph.y, graph.edges):
+                values.tofile(cache)
+        os.replace(temporary, name)
+    except OSError:
+        if os.path.exists(temporary):
+            os.remove(temporary)
+
+#Loads filename into GraphArrays. If cache is true a binary cache next to
+#the file is used when it is up to date, and written when it is not.
+def load(filename, cache=False):
+    source = os.stat(filename)
+    if cache:
+        graph = read_cache(filename, source)
+        if graph is not None:
+            return graph
+    with open(filename, "rb") as problem_file:
+        graph = parse(problem_file.read())
+    if cache:
+        write_cache(filename, source, graph)
+    return graph
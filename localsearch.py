@@ -0,0 +1,181 @@
+import heapq
+import random
+import time
+from vertexcoloring import VertexColoring
+
+#Local search for colorings with few colors, for graphs too large for the
+#complete A*-GAC search. DSATUR gives a first coloring, and with it an upper
+#bound on k. Then TabuCol looks for a coloring with one color less, again
+#and again until the time is up or k reaches the clique lower bound. The
+#best coloring found so far is always available, but local search can't
+#prove that no coloring with fewer colors exists.
+#The vertices are numbered 0 to n-1 in graph order, and the adjacency is
+#kept as lists of these numbers.
+class LocalSearch(object):
+    #Vertices, with the highest degree, cliques are grown from for the
+    #lower bound
+    clique_starts = 256
+
+    #time_limit is the seconds the search may use, max_iterations an optional
+    #limit on the tabu moves for each k. seed makes the runs reproducible.
+    def __init__(self, time_limit=10.0, max_iterations=None, seed=0):
+        self.time_limit = time_limit
+        self.max_iterations = max_iterations
+        self.random = random.Random(seed)
+        self.iterations = 0
+        #(seconds, k) each time a coloring with fewer colors was found
+        self.history = []
+
+    #Returns a dict of plain values, like solver.solve:
+    #    k           - colors used by the best coloring
+    #    coloring    - vertex number to color
+    #    lower_bound - size of the largest clique found
+    #    optimal     - if k is proven to be the chromatic number by the clique
+    #    history     - when each improvement was found
+    def search(self, graph):
+        start = time.perf_counter()
+        deadline = start + self.time_limit
+        ids = list(graph.vertices)
+        position = dict((v, i) for i, v in enumerate(ids))
+        neighbors = VertexColoring.neighbors(graph)
+        adjacent = [[position[n] for n in neighbors[v]] for v in ids]
+        cliques = VertexColoring.cliques(graph, starts=self.clique_starts)
+        lower_bound = len(cliques[0]) if cliques else min(len(ids), 2 if graph.edges else 1)
+
+        best = dsatur(adjacent)
+        k = max(best) + 1 if best else 0
+        self.history.append((time.perf_counter() - start, k))
+        while k > lower_bound and time.perf_counter() < deadline:
+            coloring = self.tabucol(adjacent, k - 1, self.drop_color(best, k - 1), deadline)
+            if coloring is None:
+                break
+            best = coloring
+            k -= 1
+            self.history.append((time.perf_counter() - start, k))
+
+        return {
+            "k": k,
+            "coloring": dict((graph.vertices[v].number, best[i]) for i, v in enumerate(ids)),
+            "lower_bound": lower_bound,
+            "optimal": k == lower_bound,
+            "history": self.history,
+            "stats": {
+                "vertices": len(ids),
+                "edges": len(graph.edges),
+                "iterations": self.iterations,
+                "time": time.perf_counter() - start,
+            },
+        }
+
+    #A k coloring to start TabuCol from, made from a coloring with one more
+    #color. The vertices with the color k get a random color instead.
+    def drop_color(self, coloring, k):
+        return [c if c < k else self.random.randrange(k) for c in coloring]
+
+    #TabuCol. Moves one conflicting vertex to another color at each step,
+    #the move that removes the most conflicts, unless the move is tabu.
+    #A vertex that leaves a color can't get it back for a number of steps that
+    #grow with the conflicts left. A tabu move is still taken if it gives
+    #fewer conflicts than ever before (aspiration).
+    #gamma[v*k + c] is the number of neighbors of v with color c, kept up to
+    #date with each move, so a move is evaluated in O(1).
+    #Returns a coloring without conflicts, or None when the time or the
+    #iterations run out.
+    def tabucol(self, adjacent, k, coloring, deadline):
+        rng = self.random
+        n = len(adjacent)
+        gamma = [0]*(n*k)
+        for v in range(n):
+            for u in adjacent[v]:
+                gamma[v*k + coloring[u]] += 1
+        conflicting = set(v for v in range(n) if gamma[v*k + coloring[v]] > 0)
+        conflicts = sum(gamma[v*k + coloring[v]] for v in conflicting)//2
+        best_conflicts = conflicts
+        tabu = [0]*(n*k)
+        iteration = 0
+        while conflicts > 0:
+            if self.max_iterations is not None and iteration >= self.max_iterations:
+                return None
+            #The clock is only read now and then
+            if iteration & 255 == 0 and time.perf_counter() >= deadline:
+                return None
+            iteration += 1
+            self.iterations += 1
+
+            move = None
+            move_delta = None
+            ties = 0
+            for v in conflicting:
+                base = v*k
+                current = gamma[base + coloring[v]]
+                for c in range(k):
+                    if c == coloring[v]:
+                        continue
+                    delta = gamma[base + c] - current
+                    if tabu[base + c] > iteration and conflicts + delta >= best_conflicts:
+                        continue
+                    if move is None or delta < move_delta:
+                        move = (v, c)
+                        move_delta = delta
+                        ties = 1
+                    elif delta == move_delta:
+                        #Picks uniformly among the best moves
+                        ties += 1
+                        if rng.randrange(ties) == 0:
+                            move = (v, c)
+            if move is None:
+                #Every move is tabu, a random conflicting vertex is moved
+                v = rng.choice(sorted(conflicting))
+                c = rng.choice([c for c in range(k) if c != coloring[v]])
+                move = (v, c)
+                move_delta = gamma[v*k + c] - gamma[v*k + coloring[v]]
+
+            v, c = move
+            old = coloring[v]
+            coloring[v] = c
+            conflicts += move_delta
+            tabu[v*k + old] = iteration + rng.randrange(10) + int(0.6*len(conflicting))
+            for u in adjacent[v]:
+                gamma[u*k + old] -= 1
+                gamma[u*k + c] += 1
+                if gamma[u*k + coloring[u]] > 0:
+                    conflicting.add(u)
+                else:
+                    conflicting.discard(u)
+            if gamma[v*k + c] > 0:
+                conflicting.add(v)
+            else:
+                conflicting.discard(v)
+            if conflicts < best_conflicts:
+                best_conflicts = conflicts
+        return coloring
+
+
+#DSATUR. Colors the vertex with the most distinct colors among its neighbors
+#next, the one with the most uncolored neighbors on ties, with the lowest
+#color its neighbors don't use. The vertices are kept in a heap with lazy
+#entries: an entry is skipped when it's no longer the vertex's latest.
+#adjacent is the adjacency lists of vertices numbered 0 to n-1. Returns the
+#list of colors.
+def dsatur(adjacent):
+    n = len(adjacent)
+    coloring = [-1]*n
+    saturation = [set() for v in range(n)]
+    degree = [len(adjacent[v]) for v in range(n)]
+    heap = [(0, -degree[v], v) for v in range(n)]
+    heapq.heapify(heap)
+    while heap:
+        negative_saturation, negative_degree, v = heapq.heappop(heap)
+        if coloring[v] != -1 or -negative_saturation != len(saturation[v]) or -negative_degree != degree[v]:
+            continue
+        used = saturation[v]
+        color = 0
+        while color in used:
+            color += 1
+        coloring[v] = color
+        for u in adjacent[v]:
+            if coloring[u] == -1:
+                saturation[u].add(color)
+                degree[u] -= 1
+                heapq.heappush(heap, (-len(saturation[u]), -degree[u], u))
+    return coloring
@@ -0,0 +1,203 @@
+from backtrack import MacInstance
+from gac import PropagationQueue
+
+#Nogood recording for the A* search. A nogood is a set of (variable, value)
+#literals that no solution has all of. When a successor is contradictory, the
+#assumptions that explain the conflict are recorded as a nogood, and a
+#successor that would make every literal of a nogood true is not generated
+#at all. Different paths often fail on the same few assumptions, and the
+#nogood saves each of them the propagation that would find the conflict again.
+#A literal is true in a store when the variable is fixed to the value,
+#by an assumption or by propagation.
+#Each nogood watches two of its literals, and is only looked at when the
+#assumption about to be made is one of them. A watch that is already true
+#is moved to a literal that is not, so the nogood is found again when that
+#literal is assumed. Watches are only a filter: a nogood is always checked in
+#full before it prunes, and a nogood missed by the watches only means the
+#propagation finds the conflict instead.
+#The store is bounded. Every nogood has an activity, bumped each time it
+#prunes, and the bump grows with every nogood recorded, so recent use counts
+#for more than old. When the store is full, the less active half is evicted.
+class NogoodStore(object):
+    #Growth of the bump for each nogood recorded
+    decay = 0.95
+
+    def __init__(self, capacity=10000):
+        self.capacity = capacity
+        #Literal to the nogoods watching it
+        self.watches = {}
+        #Literals, as a frozenset, to the nogood
+        self.nogoods = {}
+        self.bump = 1.0
+        self.recorded = 0
+        self.pruned = 0
+        self.evicted = 0
+
+    #Records literals as a nogood, unless it is already known
+    def record(self, literals):
+        key = frozenset(literals)
+        if not key:
+            return
+        nogood = self.nogoods.get(key)
+        if nogood is not None:
+            nogood.activity += self.bump
+            return
+        nogood = Nogood(literals, self.bump)
+        self.nogoods[key] = nogood
+        for literal in nogood.watched():
+            self.watches.setdefault(literal, []).append(nogood)
+        self.recorded += 1
+        self.bump /= self.decay
+        if self.bump > 1e100:
+            self.rescale()
+        if len(self.nogoods) > self.capacity:
+            self.reduce()
+
+    #The literals of a nogood that assuming value for v in store makes true,
+    #so the successor can be skipped. None if there is none.
+    def find(self, store, v, value):
+        literal = (v, value)
+        watching = self.watches.get(literal)
+        if not watching:
+            return None
+        for nogood in list(watching):
+            if self.violated(nogood, literal, store):
+                nogood.activity += self.bump
+                self.pruned += 1
+                return nogood.literals
+        return None
+
+    #Checks a nogood watching literal. If the other watch is true, the watch
+    #is moved to a literal that is not true, or, if there is none, every
+    #literal is true once literal is assumed.
+    def violated(self, nogood, literal, store):
+        literals = nogood.literals
+        if len(literals) == 1:
+            return True
+        first, second = nogood.watches
+        other = second if literals[first] == literal else first
+        if not is_true(store, literals[other]):
+            return False
+        for i in range(len(literals)):
+            if i == first or i == second:
+                continue
+            if not is_true(store, literals[i]):
+                self.move_watch(nogood, other, i)
+                return False
+        return True
+
+    def move_watch(self, nogood, old, new):
+        self.watches[nogood.literals[old]].remove(nogood)
+        self.watches.setdefault(nogood.literals[new], []).append(nogood)
+        if nogood.watches[0] == old:
+            nogood.watches = (new, nogood.watches[1])
+        else:
+            nogood.watches = (nogood.watches[0], new)
+
+    #Evicts the less active half of the nogoods
+    def reduce(self):
+        ranked = sorted(self.nogoods.items(), key=lambda item: item[1].activity)
+        evicted = ranked[:len(ranked)//2]
+        for key, nogood in evicted:
+            del self.nogoods[key]
+            nogood.evicted = True
+        self.evicted += len(evicted)
+        for literal in list(self.watches):
+            kept = [nogood for nogood in self.watches[literal] if not nogood.evicted]
+            if kept:
+                self.watches[literal] = kept
+            else:
+                del self.watches[literal]
+
+    #Scales the activities and the bump down before they overflow
+    def rescale(self):
+        for nogood in self.nogoods.values():
+            nogood.activity *= 1e-100
+        self.bump *= 1e-100
+
+    def __len__(self):
+        return len(self.nogoods)
+
+
+#The literals of a nogood, in the order they were assumed, and the
+#positions of the two watched literals. The last assumption made is
+#watched first, and the one before it second.
+class Nogood(object):
+    __slots__ = ("literals", "watches", "activity", "evicted")
+
+    def __init__(self, literals, activity):
+        self.literals = tuple(literals)
+        last = len(self.literals)-1
+        self.watches = (last, max(last-1, 0))
+        self.activity = activity
+        self.evicted = False
+
+    def watched(self):
+        if len(self.literals) == 1:
+            return [self.literals[0]]
+        return [self.literals[i] for i in self.watches]
+
+
+def is_true(store, literal):
+    v, value = literal
+    return store.is_singleton(v) and store.value(v) == value
+
+
+#ConstraintInstance for A* with nogood recording. It explains its domain
+#reductions like the MacInstance of backtrack.py, with the assumptions on
+#the path to the node as the decision levels: level i is decisions[i-1].
+#A copy gets its own explanations and an empty trail, like the store.
+class LearningInstance(MacInstance):
+    def __init__(self, network, v, d):
+        super().__init__(network, v, d)
+        #(variable, value) of each assumption on the path, in order
+        self.decisions = ()
+
+    def copy_object(self):
+        if self.stats is not None:
+            self.stats.copies += 1
+        child = object.__new__(self.__class__)
+        child.__dict__.update(self.__dict__)
+        child.queue = PropagationQueue(self.cnet.queue_order)
+        child.domain = self.domain.copy()
+        child.explanations = dict(self.explanations)
+        child.trail = []
+        return child
+
+    def assume(self, v, value):
+        self.decisions = self.decisions + ((v, value),)
+        self.decide(v, value, len(self.decisions))
+
+    #The assumptions that explain the last domain wipeout, in the order they
+    #were made
+    def nogood(self):
+        return self.literals(self.conflict)
+
+    #The nogood of a node where every value of v failed. failures is a
+    #(value, nogood) pair for each value tried. A solution would give v one
+    #of the values: a value removed before is ruled out by the explanation of
+    #v, and a value tried by the rest of its nogood. Values skipped by
+    #symmetry breaking depend on every assumption, like in backtrack.Frame.
+    def dead_end(self, v, tried, failures):
+        reason = self.explanations[v]
+        if tried < self.domain.size(v):
+            reason |= (1 << (len(self.decisions)+1)) - 2
+        levels = dict((decision, level) for level, decision in enumerate(self.decisions, 1))
+        #Literals fixed by propagation instead of an assumption go first,
+        #so the latest assumptions are the ones watched
+        others = []
+        for value, nogood in failures:
+            for literal in nogood:
+                if literal == (v, value):
+                    continue
+                level = levels.get(literal)
+                if level is None:
+                    if literal not in others:
+                        others.append(literal)
+                else:
+                    reason |= 1 << level
+        return others + self.literals(reason)
+
+    #The assumptions of the levels in the bitmask reason, in order
+    def literals(self, reason):
+        return [decision for level, decision in enumerate(self.decisions, 1) if reason >> level & 1]
@@ -0,0 +1,119 @@
+#Variable ordering heuristics for choosing the variable of the next assumption.
+#The choice of which variable should be used when making assumptions is
+#important and has a big impact on the size of the search.
+#A heuristic decides the order of the variables in the DomainStore's size
+#buckets through index_order, and picks a variable in select. Heuristics that
+#learn from conflicts are told about them through on_conflict.
+#The heuristic of a network is set with ConstraintNetwork.ordering, before
+#instances are created.
+
+#The variable with the smallest domain but bigger than one, the first in the
+#network's variable order on ties. The lowest non-empty size bucket gives
+#it directly, O(d) in the number of sizes.
+class MinDomain(object):
+    name = "min-domain"
+
+    def index_order(self, network):
+        return network.variables
+
+    def select(self, instance):
+        return instance.domain.smallest_unfixed()
+
+    def on_conflict(self, constraint):
+        pass
+
+
+#Smallest ratio of domain size to degree, the number of constraints a variable
+#is part of. The variables are ordered by decreasing degree, so the first
+#variable of each size bucket has the highest degree of its size, and only
+#one variable per size has to be compared.
+class DomDeg(MinDomain):
+    name = "dom-deg"
+
+    def index_order(self, network):
+        self.degree = dict((v, len(network.get_constraints(v))) for v in network.variables)
+        return sorted(network.variables, key=lambda v: -self.degree[v])
+
+    def select(self, instance):
+        store = instance.domain
+        best = None
+        best_ratio = None
+        for size in range(2, len(store.buckets)):
+            m = store.bucket(size)
+            if not m:
+                continue
+            v = store.order[(m & -m).bit_length()-1]
+            ratio = size/float(self.degree[v] or 0.5)
+            if best is None or ratio < best_ratio:
+                best = v
+                best_ratio = ratio
+        return best
+
+
+#dom/wdeg. Every constraint has a weight, starting at 1, that is increased
+#each time the constraint wipes out a domain. The weighted degree of a variable
+#is the sum of the weights of its constraints with at least one other unfixed
+#variable, and the variable with the smallest ratio of domain size to weighted
+#degree is chosen. The weights change with every conflict, so all unfixed
+#variables are compared, O(V) per selection.
+class DomWdeg(MinDomain):
+    name = "dom-wdeg"
+
+    def __init__(self):
+        self.weights = {}
+
+    def on_conflict(self, constraint):
+        self.weights[constraint] = self.weights.get(constraint, 1) + 1
+
+    def select(self, instance):
+        store = instance.domain
+        network = instance.cnet
+        weights = self.weights
+        best = None
+        best_ratio = None
+        for size in range(2, len(store.buckets)):
+            for v in store.variables_in(store.bucket(size)):
+                wdeg = 0
+                for c in network.get_constraints(v):
+                    for other in c.variables:
+                        if other != v and not store.is_singleton(other):
+                            wdeg += weights.get(c, 1)
+                            break
+                ratio = size/float(wdeg or 0.5)
+                if best is None or ratio < best_ratio:
+                    best = v
+                    best_ratio = ratio
+        return best
+
+
+#DSATUR. The saturation of a variable is the number of values its domain has
+#lost to fixed neighbors, so for vertex coloring the most saturated variable is
+#the one with the smallest domain. Ties are broken by the number of unfixed
+#neighbors. Only the variables of the smallest size bucket are compared.
+class Dsatur(MinDomain):
+    name = "dsatur"
+
+    def select(self, instance):
+        store = instance.domain
+        network = instance.cnet
+        for size in range(2, len(store.buckets)):
+            m = store.bucket(size)
+            if not m:
+                continue
+            best = None
+            best_degree = -1
+            for v in store.variables_in(m):
+                degree = 0
+                for c in network.get_constraints(v):
+                    for other in c.variables:
+                        if other != v and not store.is_singleton(other):
+                            degree += 1
+                if degree > best_degree:
+                    best = v
+                    best_degree = degree
+            return best
+        return None
+
+
+#The heuristics by name, for command line options
+HEURISTICS = dict((heuristic.name, heuristic) for heuristic in (MinDomain, DomDeg, DomWdeg, Dsatur))
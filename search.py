@@ -2,7 +2,6 @@ from enum import Enum
 from abstractnode import Node
 import time
 from collections import deque
-import heapq
 
 class Search(object):
     
@@ -10,31 +9,57 @@ class Search(object):
     #Init for the search object. A listner can be passed as a argument. The listner must
     #have a event method. The A* algorithm will during its execution generate gui events and
     #call the lister.
-    def __init__(self, listner):
+    #tiebreak decides which node best first search expand when F values are equal.
+    #delay is the seconds slept after each event, giving a GUI thread the
+    #chance to run. Headless runs use 0 and never sleep.
+    #stats is an optional Stats object for profiling the search.
+    #event_mode and max_rate decide which events the listner gets, see EventDispatcher.
+    #weight is the weight of H in WEIGHTED mode, and beam_width the nodes kept
+    #at each level in BEAM mode.
+    def __init__(self, listner, tiebreak=None, delay=0.001, stats=None, event_mode=None, max_rate=None,
+            weight=2.0, beam_width=50):
         if not hasattr(listner, "event"):
             raise Exception("Listner does not have event method handler")
         self.listner = listner
+        self.tiebreak = tiebreak or TieBreak.FIFO
+        self.weight = weight
+        self.beam_width = beam_width
+        self.delay = delay
+        self.stats = stats
+        self.events = EventDispatcher(listner, event_mode, max_rate, delay)
         self.nodes_generated = 0
         self.nodes_popped = 0
 
     #A* implementation - based on pseudocode from accompanying document, IDAA
     #The search method support, depth, breadth and best first search, which is specified by mode.
     #The method tries to be as general as possible, only relying on mandatory methods subclasses of Node must have.
+    #WEIGHTED is best first search on G + weight*H. BEAM and IDA have their own
+    #loops, see beam_search and ida_search.
     def search(self, start_node, mode):
         if not isinstance(start_node, Node):
             raise Exception("Node should be a subclass of Abstractnode")
         if not isinstance(mode, SearchMode):
             raise Exception("Mode is not a SearchMode type")
         if start_node.is_solution():
+            self.send_event(start_node)
             return start_node
+        if mode is SearchMode.BEAM:
+            return self.beam_search(start_node)
+        if mode is SearchMode.IDA:
+            return self.ida_search(start_node)
 
+        stats = self.stats
         closed = set() #O(1) lookup when using a set. Closed mainly used for "in" "not in" 
-        frontier = Frontier(mode) #The open list
+        if stats is None:
+            frontier = Frontier(mode, self.tiebreak, self.weight) #The open list
+        else:
+            frontier = TimedFrontier(mode, self.tiebreak, stats, self.weight)
         unique = {}
 
         #Start_node added to the frontier, and put into the unique dictionary.
         n0 = start_node
         n0.set_G( 0 )
+        n0.set_H( n0.calc_H() )
         frontier.add( n0 )
         self.nodes_generated +=1
         unique[n0.generate_id()] = n0
@@ -44,15 +69,19 @@ class Search(object):
         #In the case of best first search, the most promising node is always expanded first
         #A estimate H , and G is used to assess how promising a node might be. 
         while solution is None:
-            if not frontier.list:
+            if not frontier:
                 #All nodes has been expanded and none were found to be a solution
+                self.events.flush()
                 return None
             x = frontier.pop()
             self.nodes_popped += 1
+            if stats is not None:
+                stats.on_pop(self.nodes_generated, self.nodes_popped)
             self.send_event(x)
             closed.add(x)
             if x.is_solution():
                 #Node is return in case node x is the solution
+                self.events.flush()
                 return x
 
             #For each successor node of x, it is added as a child of node x,
@@ -60,12 +89,12 @@ class Search(object):
             #If child node is a new unique node it is added to the frontier list/heap. If successor node,
             #has been seen before, it can still impact the search. THe parent til successor path might
             #represent a better way (cost less), than already found. 
-            successors = x.generate_successors()
-            for s in successors:
-                if s.generate_id() in unique:
-                    s = unique[s.generate_id()]
+            for s in self.expand(x):
+                s_id = s.generate_id()
+                if s_id in unique:
+                    s = unique[s_id]
                 else:
-                    unique[s.generate_id()] = s
+                    unique[s_id] = s
                     #Only successors that are unique is added to nodes_generated. It is only those that
                     #are used further.
                     self.nodes_generated += 1
@@ -83,58 +112,275 @@ class Search(object):
                         #already been popped from the frontier,
                         #which means the improvements has to be
                         #propagated to the nodes children.
-                        self.propagatePathImprovements(s)
-                        #Propagating improvements can change the F value of some nodes, and
-                        #heap list has to be sorted to keep the heap invariant.
-                    frontier.reheap()
+                        #Propagating improvements can change the F value of some nodes,
+                        #which are moved in the frontier to keep the heap invariant.
+                        self.propagatePathImprovements(s, frontier)
+                    else:
+                        frontier.update(s)
+
+    #Beam search. The nodes are expanded a level at a time, and only the
+    #beam_width best successors, by F and the tiebreak, are kept for the next
+    #level. Nodes from earlier levels are forgotten, so memory is bounded by
+    #the width, but a solution is not guaranteed to be found even if one exists.
+    def beam_search(self, start_node):
+        stats = self.stats
+        tiebreak = TIEBREAKERS[self.tiebreak]
+        start_node.set_G( 0 )
+        start_node.set_H( start_node.calc_H() )
+        self.nodes_generated += 1
+        level = [start_node]
+        while level:
+            unique = {}
+            for x in level:
+                self.nodes_popped += 1
+                if stats is not None:
+                    stats.on_pop(self.nodes_generated, self.nodes_popped)
+                self.send_event(x)
+                if x.is_solution():
+                    self.events.flush()
+                    return x
+                for s in self.expand(x):
+                    s_id = s.generate_id()
+                    if s_id not in unique:
+                        unique[s_id] = s
+                        self.nodes_generated += 1
+                        self.attachAndEval(s, x)
+            #Successors are numbered in the order they were generated,
+            #which keeps the order of equal nodes stable
+            candidates = [(s.f, tiebreak(s), i, s) for i, s in enumerate(unique.values())]
+            candidates.sort()
+            level = [entry[3] for entry in candidates[:self.beam_width]]
+        self.events.flush()
+        return None
+
+    #Iterative deepening A*. Depth first search that cuts off nodes with an F
+    #value above a threshold. The threshold starts at F of the start node, and
+    #is raised to the lowest F that was cut off until a solution is found.
+    #Only the current path and the untried successors along it are kept.
+    #Nodes on the current path are not expanded again, avoiding cycles.
+    def ida_search(self, start_node):
+        start_node.set_G( 0 )
+        start_node.set_H( start_node.calc_H() )
+        self.nodes_generated += 1
+        threshold = start_node.f
+        while threshold is not None:
+            solution, threshold = self.bounded_search(start_node, threshold)
+            if solution is not None:
+                self.events.flush()
+                return solution
+        self.events.flush()
+        return None
+
+    #One iteration of IDA*. Returns the solution, if any, and the lowest F
+    #above the threshold, None if no node was cut off.
+    def bounded_search(self, start_node, threshold):
+        stats = self.stats
+        next_threshold = None
+        path = set()
+        #Stack of (node, iterator over the successors not yet visited)
+        stack = [(start_node, None)]
+        while stack:
+            x, successors = stack[-1]
+            if successors is None:
+                self.nodes_popped += 1
+                if stats is not None:
+                    stats.on_pop(self.nodes_generated, self.nodes_popped)
+                self.send_event(x)
+                if x.is_solution():
+                    return x, None
+                path.add(x.generate_id())
+                successors = iter(self.expand(x))
+                stack[-1] = (x, successors)
+            s = next(successors, None)
+            if s is None:
+                stack.pop()
+                path.discard(x.generate_id())
+                continue
+            if s.generate_id() in path:
+                continue
+            self.nodes_generated += 1
+            self.attachAndEval(s, x)
+            if s.f > threshold:
+                if next_threshold is None or s.f < next_threshold:
+                    next_threshold = s.f
+                continue
+            stack.append((s, None))
+        return None, next_threshold
+
+    #The successors of x, timed as the successors phase when stats are collected
+    def expand(self, x):
+        stats = self.stats
+        if stats is None:
+            return x.generate_successors()
+        started = time.perf_counter()
+        successors = x.generate_successors()
+        stats.add_time("successors", started)
+        return successors
 
     def send_event(self, x):
-        self.listner.event(x.gui_representation(
-            self.nodes_generated,
-            self.nodes_popped
-            ))
-        #Give thread a chance to yield to other threads
-        time.sleep(0.001)
+        self.events.send(x, self.nodes_generated, self.nodes_popped)
 
     #Method that construct node graph, and sets the successors G value.
+    #H only depends on the node's state, and is only calculated the first time.
     def attachAndEval(self, child, parent):
         child.set_parent(parent)
         child.set_G( parent.get_G() + parent.arc_cost(child) )
-        child.calc_H()
-        #calcF add g and together when called
+        if child.get_H() is None:
+            child.set_H( child.calc_H() )
+        #F is updated when G and H is set
     
     #Recursive method that is used whenever a better way from a node to a successor is found.
     #If this successor is in the closed set, it is reasonable to assume that it might have it's own
     # children nodes. THese also has to be updated with new G values.
-    def propagatePathImprovements(self, parent):
+    #Children still in the frontier are moved to their new place in the heap.
+    def propagatePathImprovements(self, parent, frontier):
         for child in parent.get_children():
             if parent.get_G() + parent.arc_cost(child) < child.get_G():
                 child.set_parent(parent)
                 child.set_G( parent.get_G() + parent.arc_cost(child) )
                 #F(C) auto calculated
-                self.propagatePathImprovements(child)
+                frontier.update(child)
+                self.propagatePathImprovements(child, frontier)
+
+
+#Listner for running a search without a display. Ignores all events.
+class NullListener(object):
+    def event(self, data):
+        pass
+
+
+#Event given to the listner for a popped node. The gui representation of
+#the node is only built when the listner first reads from the event, so
+#events that are dropped or never looked at cost almost nothing.
+#Reads like the dict returned by gui_representation.
+class LazyEvent(object):
+    def __init__(self, node, generated, popped):
+        self.node = node
+        self.generated = generated
+        self.popped = popped
+        self.data = None
+
+    def resolve(self):
+        if self.data is None:
+            self.data = self.node.gui_representation(self.generated, self.popped)
+        return self.data
+
+    def __getitem__(self, key):
+        return self.resolve()[key]
+
+
+#Decides which events reach the listner, and when.
+#    ALL      - every popped node, at most max_rate events per second if set.
+#               Events over the rate are dropped.
+#    LATEST   - only the newest event is kept while waiting for the rate
+#               limit, and it is delivered when the limit allows or the search
+#               ends. Defaults to 25 events per second.
+#    SOLUTION - only the solution node.
+#A solution is always delivered. Nothing is delivered to a NullListener, and
+#delay is only slept after events that were delivered.
+class EventDispatcher(object):
+    DEFAULT_LATEST_RATE = 25
+
+    def __init__(self, listner, mode=None, max_rate=None, delay=0):
+        self.listner = listner
+        self.mode = mode or EventMode.ALL
+        if max_rate is None and self.mode is EventMode.LATEST:
+            max_rate = self.DEFAULT_LATEST_RATE
+        self.interval = 1.0/max_rate if max_rate else 0
+        self.delay = delay
+        self.enabled = not isinstance(listner, NullListener)
+        self.last = None
+        self.pending = None
+
+    def send(self, node, generated, popped):
+        if not self.enabled:
+            return
+        if node.is_solution():
+            self.deliver(LazyEvent(node, generated, popped))
+            return
+        if self.mode is EventMode.SOLUTION:
+            return
+        event = LazyEvent(node, generated, popped)
+        if not self.due():
+            if self.mode is EventMode.LATEST:
+                self.pending = event
+            return
+        self.deliver(event)
+
+    #True if the max_rate allows an event to be delivered now
+    def due(self):
+        return not self.interval or self.last is None or time.perf_counter() - self.last >= self.interval
+
+    #True if an event sent now would be delivered right away. Lets a sender
+    #whose events are costly to make skip the ones that would be dropped or
+    #held back.
+    def accepts(self, solution):
+        if not self.enabled:
+            return False
+        if solution:
+            return True
+        return self.mode is not EventMode.SOLUTION and self.due()
+
+    #Delivers the event held back by LATEST, if any
+    def flush(self):
+        if self.pending is not None:
+            self.deliver(self.pending)
+
+    def deliver(self, event):
+        self.pending = None
+        self.last = time.perf_counter()
+        self.listner.event(event)
+        #Give thread a chance to yield to other threads
+        if self.delay:
+            time.sleep(self.delay)
+
+
+#Which events the search sends to its listner, see EventDispatcher
+class EventMode(Enum):
+    ALL = 1
+    LATEST = 2
+    SOLUTION = 3
 
 
 #To support depth, breadth and best search using the same
 #algorithm the open list has to have different modes of inserting
 #and retrieving nodes. At initialization the mode determine how the add
 #and pop method will function.
+#For best first search the list is a binary heap of (f, tiebreak, counter, node)
+#entries, so the heap only does plain tuple compares. The counter is unique
+#and keeps nodes with equal keys in FIFO order. The position of each node is
+#kept in a dict. Membership is O(1), and a node whose F value has changed can
+#be moved to its new place in O(log n) with update.
+#Weighted best first search use the same heap, with G + weight*H in place of F.
+#The other modes keep the members in a set for O(1) membership.
 class Frontier(object):
-    def __init__(self, mode):
+    def __init__(self, mode, tiebreak=None, weight=1.0):
         self.list = []
         self.mode = mode
-        if mode is SearchMode.BEST:
-            heapq.heapify(self.list)
-        elif mode is SearchMode.BREADTH:
+        self.position = {}
+        self.counter = 0
+        self.tiebreak = TIEBREAKERS[tiebreak or TieBreak.FIFO]
+        self.weight = weight
+        self.heap = mode is SearchMode.BEST or mode is SearchMode.WEIGHTED
+        if mode is SearchMode.BREADTH:
             self.list = deque([])
 
-    #Add is only different if its a best first search. The node has to
-    #be added, and the heap has to be reheapifyed.
+    #The value a node is ordered by in the heap
+    def key(self, node):
+        if self.mode is SearchMode.WEIGHTED:
+            return node.g + self.weight*node.h
+        return node.f
+
+    #Add is only different if its a best first search. The node is put
+    #last in the heap, and moved up to its place.
     def add(self, node):
-        if self.mode is SearchMode.BEST:
-            heapq.heappush(self.list, node)
+        if self.heap:
+            self.counter += 1
+            self.list.append((self.key(node), self.tiebreak(node), self.counter, node))
+            self.sift_up(len(self.list)-1)
         else:
             self.list.append(node)
+            self.position[node] = True
 
     #Popping works differently for all modes. For the best first search,
     #the node with the lowest F value is popped from the heap.
@@ -142,30 +388,138 @@ class Frontier(object):
     #Breadth, the list acts as a queue. FIFO. Only the best first uses knownledge about the
     #problem domain. The two others work blindly, and the pop method is the reason why.
     def pop(self):
-        if self.mode is SearchMode.BEST:
-            return heapq.heappop(self.list)
+        if self.heap:
+            heap = self.list
+            node = heap[0][3]
+            last = heap.pop()
+            del self.position[node]
+            if heap:
+                heap[0] = last
+                self.position[last[3]] = 0
+                self.sift_down(0)
+            return node
         elif self.mode is SearchMode.DEPTH:
-            return self.list.pop()
+            node = self.list.pop()
         elif self.mode is SearchMode.BREADTH:
-            return self.list.popleft()
+            node = self.list.popleft()
+        del self.position[node]
+        return node
+
+    #If the G or/and H value of a node in the frontier change and therefore the
+    #F value, the node has to be moved in the heap. This can happen if a better
+    #path from one node to another is found, which changes the G value.
+    def update(self, node):
+        if self.heap and node in self.position:
+            i = self.position[node]
+            entry = self.list[i]
+            self.list[i] = (self.key(node), self.tiebreak(node), entry[2], node)
+            self.sift_up(i)
+            self.sift_down(self.position[node])
 
-    #If the G or/and H value change and therefore the F value, the heap has to
-    #be sorted again. This can happen is a better path from one node to another is found.
-    #This changes the G value.
-    def reheap(self):
-        if self.mode is SearchMode.BEST:
-            self.list.sort()
+    #Moves the entry at index i up the heap until its parent is not larger.
+    def sift_up(self, i):
+        heap = self.list
+        position = self.position
+        entry = heap[i]
+        while i > 0:
+            parent_index = (i-1) >> 1
+            parent = heap[parent_index]
+            if not entry < parent:
+                break
+            heap[i] = parent
+            position[parent[3]] = i
+            i = parent_index
+        heap[i] = entry
+        position[entry[3]] = i
+
+    #Moves the entry at index i down the heap until no child is smaller.
+    def sift_down(self, i):
+        heap = self.list
+        position = self.position
+        size = len(heap)
+        entry = heap[i]
+        while True:
+            child_index = 2*i + 1
+            if child_index >= size:
+                break
+            right = child_index + 1
+            if right < size and heap[right] < heap[child_index]:
+                child_index = right
+            child = heap[child_index]
+            if not child < entry:
+                break
+            heap[i] = child
+            position[child[3]] = i
+            i = child_index
+        heap[i] = entry
+        position[entry[3]] = i
 
     def size(self):
         return len(self.list)
 
+    def __len__(self):
+        return len(self.list)
+
     def __contains__(self, key):
-        return key in self.list
+        return key in self.position
+
+
+#How best first search orders nodes with the same F value. FIFO expands
+#the node added first. DEEPER expands the node with the highest G first,
+#which tend to reach a solution sooner. LOWEST_H expands the node estimated
+#closest to the goal first.
+class TieBreak(Enum):
+    FIFO = 1
+    DEEPER = 2
+    LOWEST_H = 3
+
+
+#The second element of the heap entries for each TieBreak
+TIEBREAKERS = {
+    TieBreak.FIFO: lambda node: 0,
+    TieBreak.DEEPER: lambda node: -node.g,
+    TieBreak.LOWEST_H: lambda node: node.h,
+}
+
+
+#Frontier that adds the time spent in add, pop and update to the heap
+#phase of a Stats object. Used by Search when stats are collected.
+class TimedFrontier(Frontier):
+    def __init__(self, mode, tiebreak, stats, weight=1.0):
+        super().__init__(mode, tiebreak, weight)
+        self.stats = stats
+
+    def add(self, node):
+        started = time.perf_counter()
+        super().add(node)
+        self.stats.add_time("heap", started)
+
+    def pop(self):
+        started = time.perf_counter()
+        node = super().pop()
+        self.stats.add_time("heap", started)
+        return node
+
+    def update(self, node):
+        started = time.perf_counter()
+        super().update(node)
+        self.stats.add_time("heap", started)
 
 
 #Enum for the different supported modes of search. Best,
-#depth and breadth first search     
+#depth and breadth first search. WEIGHTED is best first search with a
+#weighted H, BEAM is beam search and IDA iterative deepening A*.
+#WEIGHTED and BEAM trade the fewest assumptions for finding a solution
+#sooner, BEAM and IDA use bounded memory.
 class SearchMode(Enum):
     BEST = 1
     DEPTH = 2
-    BREADTH = 3
\ No newline at end of file
+    BREADTH = 3
+    WEIGHTED = 4
+    BEAM = 5
+    IDA = 6
+
+    #False if the search can miss a solution that exists, so a search that
+    #finds none proves nothing. BEAM forgets the nodes outside the beam.
+    def is_complete(self):
+        return self is not SearchMode.BEAM
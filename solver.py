@@ -0,0 +1,231 @@
+import multiprocessing
+import time
+from enum import Enum
+from gac import GacNode, QueueOrder, Consistency
+from domain import BitmaskDomainStore
+from search import Search, SearchMode, NullListener
+from vertexcoloring import VertexColoring
+from ordering import MinDomain
+from backtrack import Backtracking
+from nogoods import NogoodStore, LearningInstance
+from stats import Stats
+
+#Runs A*-GAC vertex coloring of a graph with k colors without any GUI,
+#so it can be used from scripts and the command line. The result is a
+#dict of plain values that can be written directly as JSON:
+#    solved   - if a coloring with k colors was found
+#    coloring - vertex number to color, None if not solved
+#    complete - if the search was complete, so that not solved proves there
+#               is no coloring. Beam search is not.
+#    stats    - search counters and the time used in seconds
+#    profile  - the counters of stats as a dict, only if a Stats object is given
+#ordering is the variable ordering heuristic class, see ordering.py
+#engine selects A* (mode and tiebreak apply) or depth-first MAC with
+#backjumping, see Engine. weight and beam_width are used by the WEIGHTED and
+#BEAM search modes.
+#With split set the connected components are solved one by one, see
+#solve_components, in a pool of workers processes if workers is above one.
+#With peel set only the k-core is searched, and the vertices peeled away
+#are colored greedily afterwards.
+#break_symmetry skips assumptions with colors symmetric to one already tried.
+#With cliques set, cliques found greedily give a lower bound on the number of
+#colors. If it is above k the search is not run at all, otherwise the cliques
+#are added as AllDifferent constraints. The bound is in the stats.
+#consistency is the propagation strength, see gac.Consistency.
+#nogoods is the number of nogoods the A* search keeps, see nogoods.py, None
+#to record none. The MAC engine backjumps instead, and ignores it.
+def solve(graph, k, mode=SearchMode.BEST, store_class=BitmaskDomainStore,
+        tiebreak=None, queue_order=QueueOrder.FIFO, listener=None, stats=None,
+        ordering=MinDomain, engine=None, weight=2.0, beam_width=50, split=False, workers=None,
+        peel=False, break_symmetry=False, cliques=False, consistency=Consistency.AC,
+        nogoods=None):
+    if split:
+        return solve_components(graph, k, workers, listener=listener, stats=stats,
+            mode=mode, store_class=store_class, tiebreak=tiebreak, queue_order=queue_order,
+            ordering=ordering, engine=engine, weight=weight, beam_width=beam_width, peel=peel,
+            break_symmetry=break_symmetry, cliques=cliques, consistency=consistency,
+            nogoods=nogoods)
+    start = time.time()
+    found = None
+    if cliques:
+        found = VertexColoring.cliques(graph)
+        lower_bound = lower_bound_of(graph, found)
+        if lower_bound > k:
+            return infeasible(graph, k, lower_bound, start, stats)
+        #The pigeonhole check of a clique rarely fails when it has far fewer
+        #vertices than there are colors, and then only cost time
+        found = [clique for clique in found if len(clique) >= k-1]
+    cn = VertexColoring.convert_graph_to_cnet(graph, k, peel, break_symmetry, found)
+    cn.queue_order = queue_order
+    cn.consistency = consistency
+    cn.ordering = ordering()
+    cn.stats = stats
+    if engine is Engine.MAC:
+        searcher = Backtracking(listener or NullListener(), delay=0, stats=stats)
+        instance = searcher.search(cn, store_class)
+        assumptions = searcher.assumptions
+    else:
+        instance_class = None
+        if nogoods:
+            cn.nogoods = NogoodStore(nogoods)
+            instance_class = LearningInstance
+        start_node = GacNode(cn.create_instance(store_class, instance_class), is_root=True)
+        searcher = Search(listener or NullListener(), tiebreak, delay=0, stats=stats,
+            weight=weight, beam_width=beam_width)
+        result_node = searcher.search(start_node, mode)
+        instance = result_node.ci if result_node else None
+        assumptions = result_node.get_level() if result_node else None
+
+    coloring = None
+    if instance is not None:
+        colors = {}
+        for v in cn.variables:
+            colors[v] = instance.domain.value(v)
+        VertexColoring.color_peeled(graph, colors, cn.peeled)
+        coloring = {}
+        for v, color in colors.items():
+            coloring[graph.vertices[v].number] = color
+
+    result = {
+        "k": k,
+        "solved": instance is not None,
+        "coloring": coloring,
+        "complete": engine is Engine.MAC or mode.is_complete(),
+        "stats": {
+            "vertices": len(graph.vertices),
+            "edges": len(graph.edges),
+            "nodes_generated": searcher.nodes_generated,
+            "nodes_popped": searcher.nodes_popped,
+            "assumptions": assumptions,
+            "time": time.time() - start,
+        },
+    }
+    if engine is Engine.MAC:
+        result["stats"]["backjumps"] = searcher.backjumps
+    if cn.nogoods is not None:
+        result["stats"]["nogoods"] = cn.nogoods.recorded
+        result["stats"]["nogood_prunes"] = cn.nogoods.pruned
+    if peel:
+        result["stats"]["core"] = len(cn.variables)
+    if cliques:
+        result["stats"]["lower_bound"] = lower_bound
+    if stats is not None:
+        stats.nodes_generated = searcher.nodes_generated
+        stats.nodes_popped = searcher.nodes_popped
+        result["profile"] = stats.as_dict()
+    return result
+
+
+#Solves each connected component of the graph with its own search, and
+#merges the colorings. Branching in one component no longer multiplies the
+#search of the others, so the work is the sum of the parts. The search stops
+#at the first component with no coloring.
+#If workers is above one, the components are solved in a pool of processes.
+#The listener only gets events when the components are solved in this process.
+#options are the keyword arguments of solve.
+def solve_components(graph, k, workers=None, listener=None, stats=None, **options):
+    start = time.time()
+    parts = VertexColoring.components(graph)
+    results = []
+    if workers and workers > 1 and len(parts) > 1:
+        pool = multiprocessing.Pool(workers)
+        try:
+            jobs = [(part, k, options, stats is not None) for part in parts]
+            for result in pool.imap_unordered(solve_part, jobs):
+                results.append(result)
+                if stats is not None:
+                    stats.merge(result.pop("profile"))
+                if not result["solved"]:
+                    break
+        finally:
+            pool.terminate()
+            pool.join()
+    else:
+        generated = 0
+        popped = 0
+        for part in parts:
+            result = solve(part, k, listener=listener, stats=stats, **options)
+            results.append(result)
+            #solve sets the node counts of stats for its own search
+            generated += result["stats"]["nodes_generated"]
+            popped += result["stats"]["nodes_popped"]
+            if stats is not None:
+                stats.nodes_generated = generated
+                stats.nodes_popped = popped
+            if not result["solved"]:
+                break
+
+    solved = len(results) == len(parts) and all(result["solved"] for result in results)
+    coloring = None
+    if solved:
+        coloring = {}
+        for result in results:
+            coloring.update(result["coloring"])
+    merged = {
+        "k": k,
+        "solved": solved,
+        "coloring": coloring,
+        "complete": all(result["complete"] for result in results),
+        "stats": {
+            "vertices": len(graph.vertices),
+            "edges": len(graph.edges),
+            "components": len(parts),
+            "nodes_generated": sum(result["stats"]["nodes_generated"] for result in results),
+            "nodes_popped": sum(result["stats"]["nodes_popped"] for result in results),
+            "assumptions": sum(result["stats"]["assumptions"] for result in results) if solved else None,
+            "time": time.time() - start,
+        },
+    }
+    for counter in ("backjumps", "core", "nogoods", "nogood_prunes"):
+        if any(counter in result["stats"] for result in results):
+            merged["stats"][counter] = sum(result["stats"].get(counter, 0) for result in results)
+    if any("lower_bound" in result["stats"] for result in results):
+        merged["stats"]["lower_bound"] = max(result["stats"].get("lower_bound", 0) for result in results)
+    if stats is not None:
+        merged["profile"] = stats.as_dict()
+    return merged
+
+#The number of colors the graph needs at least: the size of the largest of
+#the cliques, and at least 2 if there are edges, 1 if there are vertices.
+def lower_bound_of(graph, cliques):
+    if cliques:
+        return len(cliques[0])
+    if graph.edges:
+        return 2
+    return min(len(graph.vertices), 1)
+
+#The result of solve when the lower bound already rules out k colors
+def infeasible(graph, k, lower_bound, start, stats):
+    result = {
+        "k": k,
+        "solved": False,
+        "coloring": None,
+        "complete": True,
+        "stats": {
+            "vertices": len(graph.vertices),
+            "edges": len(graph.edges),
+            "nodes_generated": 0,
+            "nodes_popped": 0,
+            "assumptions": None,
+            "lower_bound": lower_bound,
+            "time": time.time() - start,
+        },
+    }
+    if stats is not None:
+        result["profile"] = stats.as_dict()
+    return result
+
+#Solves one component in a worker process of solve_components
+def solve_part(job):
+    part, k, options, profile = job
+    stats = None
+    if profile:
+        stats = Stats()
+    return solve(part, k, stats=stats, **options)
+
+
+#The search engines solve can use. ASTAR is the best first Search over
+#GacNodes, MAC is the depth-first Backtracking, which uses O(V*d) memory.
+class Engine(Enum):
+    ASTAR = 1
+    MAC = 2
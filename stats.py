@@ -0,0 +1,83 @@
+import time
+
+#Counters and timings for profiling the A*-GAC engine. Collecting is opt-in:
+#the ConstraintNetwork and Search hold None by default, and the hot paths only
+#check for None before counting. Set network.stats and pass stats to
+#Search to collect, they can share the same object.
+#    revisions          - revise calls
+#    checks             - values, or combinations of values, tested against a constraint
+#    pruned             - values removed from domains by revise
+#    queue_pushes       - revise requests added to propagation queues
+#    revisions_avoided  - revise requests skipped since they were already queued
+#    copies             - ConstraintInstance copies
+#    probes             - values probed by singleton arc consistency
+#    timings            - seconds spent in each phase of the search
+#Snapshots of the counters can be taken every snapshot_interval seconds
+#while the search runs, to follow long runs as they progress.
+class Stats(object):
+    PHASES = ("propagation", "successors", "heap")
+    COUNTERS = ("revisions", "checks", "pruned", "queue_pushes", "revisions_avoided", "copies",
+        "probes", "nodes_generated", "nodes_popped")
+
+    def __init__(self, snapshot_interval=None):
+        self.revisions = 0
+        self.checks = 0
+        self.pruned = 0
+        self.queue_pushes = 0
+        self.revisions_avoided = 0
+        self.copies = 0
+        self.probes = 0
+        self.nodes_generated = 0
+        self.nodes_popped = 0
+        self.timings = dict((phase, 0.0) for phase in self.PHASES)
+        self.snapshot_interval = snapshot_interval
+        self.snapshots = []
+        self.start = time.perf_counter()
+        self.last_snapshot = self.start
+
+    #Adds the seconds since started to the time spent in phase.
+    #Returns the current time, so consecutive phases can be chained.
+    def add_time(self, phase, started):
+        now = time.perf_counter()
+        self.timings[phase] += now - started
+        return now
+
+    #Called by the search when a node is popped. Takes a snapshot if
+    #snapshot_interval seconds have passed since the last one.
+    def on_pop(self, generated, popped):
+        self.nodes_generated = generated
+        self.nodes_popped = popped
+        if self.snapshot_interval is not None:
+            now = time.perf_counter()
+            if now - self.last_snapshot >= self.snapshot_interval:
+                self.last_snapshot = now
+                self.snapshot()
+
+    def snapshot(self):
+        self.snapshots.append(self.as_dict(include_snapshots=False))
+
+    #Adds the counters and timings of a dict from as_dict, like the profile
+    #of a run in another process.
+    def merge(self, data):
+        for counter in self.COUNTERS:
+            setattr(self, counter, getattr(self, counter) + data[counter])
+        for phase, seconds in data["timings"].items():
+            self.timings[phase] = self.timings.get(phase, 0.0) + seconds
+
+    def as_dict(self, include_snapshots=True):
+        data = {
+            "elapsed": time.perf_counter() - self.start,
+            "revisions": self.revisions,
+            "checks": self.checks,
+            "pruned": self.pruned,
+            "queue_pushes": self.queue_pushes,
+            "revisions_avoided": self.revisions_avoided,
+            "copies": self.copies,
+            "probes": self.probes,
+            "nodes_generated": self.nodes_generated,
+            "nodes_popped": self.nodes_popped,
+            "timings": dict(self.timings),
+        }
+        if include_snapshots:
+            data["snapshots"] = list(self.snapshots)
+        return data
@@ -0,0 +1,148 @@
+import random
+import unittest
+from graph import GraphModel, NodeModel, EdgeModel
+from search import Search, SearchMode, NullListener
+from gac import Consistency, GacNode
+from domain import BitmaskDomainStore
+from vertexcoloring import VertexColoring
+from nogoods import NogoodStore, LearningInstance
+import solver
+import chromatic
+
+#Cross-checks of the solver options against plain best first search.
+#Backjumping, symmetry breaking, nogoods and singleton arc consistency all
+#remove parts of the search, and when they are wrong they return "no
+#coloring" for graphs that have one. Small random graphs near the coloring
+#threshold are solved with random combinations of the options, and must get
+#the same answer as best first search without any of them.
+#A wrong nogood often still leaves another coloring to be found, so the
+#nogoods recorded are also checked one by one.
+#    python -m unittest test_solver
+
+#A random graph with n vertices, each edge present with probability p
+def random_graph(rng, n, p):
+    graph = GraphModel()
+    for i in range(n):
+        graph.add_vertex(NodeModel(i, rng.random(), rng.random()))
+    for i in range(n):
+        for j in range(i+1, n):
+            if rng.random() < p:
+                graph.add_edge(EdgeModel(graph.get_vertex("N" + str(i)), graph.get_vertex("N" + str(j))))
+    return graph
+
+#True if the coloring gives the ends of every edge different colors
+def is_proper(graph, coloring):
+    return all(coloring[edge.sp.number] != coloring[edge.ep.number] for edge in graph.edges)
+
+
+class SolverCrossCheck(unittest.TestCase):
+    cases = 500
+
+    #Random options for solve
+    def random_options(self, rng):
+        return {
+            "mode": rng.choice([SearchMode.BEST, SearchMode.DEPTH, SearchMode.IDA]),
+            "engine": rng.choice([solver.Engine.ASTAR, solver.Engine.MAC]),
+            "break_symmetry": rng.random() < 0.5,
+            "nogoods": rng.choice([None, 20, 10000]),
+            "consistency": rng.choice([Consistency.AC, Consistency.AC, Consistency.RESTRICTED_SAC, Consistency.SAC]),
+            "cliques": rng.random() < 0.3,
+            "peel": rng.random() < 0.3,
+            "split": rng.random() < 0.3,
+        }
+
+    def test_solve_matches_best_first(self):
+        rng = random.Random(7)
+        for case in range(self.cases):
+            n = rng.randint(4, 22)
+            k = rng.choice([2, 3, 3, 4])
+            graph = random_graph(rng, n, (1.2*k)/n*rng.uniform(0.8, 1.4))
+            expected = solver.solve(graph, k)["solved"]
+            options = self.random_options(rng)
+            result = solver.solve(graph, k, **options)
+            message = "case " + str(case) + " n=" + str(n) + " k=" + str(k) + " " + str(options)
+            self.assertEqual(result["solved"], expected, message)
+            self.assertTrue(result["complete"], message)
+            if result["solved"]:
+                self.assertTrue(is_proper(graph, result["coloring"]), message)
+
+    #The graphs above are mostly solved with little search. These are just
+    #below the average degree where colorings stop existing, where paths
+    #often fail on the same assumptions and backjumps and nogoods matter.
+    def test_hard_graphs_match_best_first(self):
+        rng = random.Random(11)
+        pruned = 0
+        backjumps = 0
+        for case in range(80):
+            n = rng.randint(20, 30)
+            k = rng.choice([3, 4])
+            graph = random_graph(rng, n, (4.4 if k == 3 else 8.0)/n*rng.uniform(0.9, 1.05))
+            expected = solver.solve(graph, k)["solved"]
+            options = self.random_options(rng)
+            result = solver.solve(graph, k, **options)
+            message = "case " + str(case) + " n=" + str(n) + " k=" + str(k) + " " + str(options)
+            self.assertEqual(result["solved"], expected, message)
+            if result["solved"]:
+                self.assertTrue(is_proper(graph, result["coloring"]), message)
+            pruned += result["stats"].get("nogood_prunes", 0)
+            backjumps += result["stats"].get("backjumps", 0)
+        self.assertGreater(pruned, 0)
+        self.assertGreater(backjumps, 0)
+
+    #Every nogood recorded must be a partial coloring that no coloring
+    #extends. On a graph with no coloring every partial coloring is a nogood,
+    #so only graphs that have one are used.
+    def test_recorded_nogoods_have_no_solution(self):
+        rng = random.Random(5)
+        cases = 0
+        checked = 0
+        while cases < 30:
+            n = rng.randint(20, 30)
+            k = rng.choice([3, 4])
+            #Just below the average degree where colorings stop existing,
+            #where the search fails the most
+            graph = random_graph(rng, n, (4.4 if k == 3 else 8.0)/n*rng.uniform(0.9, 1.05))
+            if not solver.solve(graph, k)["solved"]:
+                continue
+            cases += 1
+            cn = VertexColoring.convert_graph_to_cnet(graph, k, break_symmetry=rng.random() < 0.5)
+            cn.nogoods = NogoodStore()
+            start_node = GacNode(cn.create_instance(BitmaskDomainStore, LearningInstance), is_root=True)
+            Search(NullListener(), delay=0).search(start_node, SearchMode.BEST)
+            for nogood in cn.nogoods.nogoods:
+                check = VertexColoring.convert_graph_to_cnet(graph, k)
+                for v, value in nogood:
+                    check.set_domain(v, [value])
+                node = GacNode(check.create_instance(BitmaskDomainStore), is_root=True)
+                found = None
+                if not node.ci.is_contradictory():
+                    found = Search(NullListener(), delay=0).search(node, SearchMode.BEST)
+                self.assertIsNone(found, "case " + str(cases) + " nogood " + str(sorted(nogood)))
+                checked += 1
+        self.assertGreater(checked, 0)
+
+    def test_chromatic_matches_best_first(self):
+        rng = random.Random(11)
+        for case in range(8):
+            n = rng.randint(5, 14)
+            graph = random_graph(rng, n, rng.uniform(0.2, 0.5))
+            expected = 1 if graph.vertices else 0
+            while not solver.solve(graph, expected)["solved"]:
+                expected += 1
+            options = self.random_options(rng)
+            del options["split"]
+            result = chromatic.chromatic_number(graph, workers=2, **options)
+            message = "case " + str(case) + " n=" + str(n) + " " + str(options)
+            self.assertEqual(result["chromatic_number"], expected, message)
+            self.assertTrue(is_proper(graph, result["coloring"]), message)
+
+    #Beam search can miss colorings, and is never taken as a proof
+    def test_beam_is_not_a_proof(self):
+        rng = random.Random(3)
+        graph = random_graph(rng, 12, 0.3)
+        result = solver.solve(graph, 1, mode=SearchMode.BEAM, beam_width=1)
+        self.assertFalse(result["complete"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,5 +1,6 @@
 
 from gac import ConstraintNetwork
+from graph import GraphModel
 
 #Problem specific class. The a*-gac only accept
 #variables, constraints and domains so a specific problem in
@@ -11,8 +12,21 @@ class VertexColoring(object):
     #Prepares the constraint network from the graph.
     #Convert the graph and k into a variables, constraints and domain
     #the general arc consistency algorithm can solve.
-    def convert_graph_to_cnet(graph, k):
+    #With peel set only the k-core of the graph is converted, see peel. The
+    #peeled vertex ids are kept in the network's peeled list, and are colored
+    #with color_peeled once the core has a coloring.
+    #With break_symmetry set, assumptions only try the colors already used
+    #and the lowest unused color, since the unused colors are interchangeable.
+    #cliques is a list of cliques, lists of vertex ids, that are added as
+    #AllDifferent constraints. Cliques with a vertex outside the graph, or
+    #peeled away, are left out.
+    def convert_graph_to_cnet(graph, k, peel=False, break_symmetry=False, cliques=None):
+        peeled = []
+        if peel:
+            graph, peeled = VertexColoring.peel(graph, k)
         cn = ConstraintNetwork()
+        cn.peeled = peeled
+        cn.interchangeable_values = break_symmetry
         for key,v in graph.vertices.items():
             cn.add_variable(v.id)
             cn.set_domain(v.id, list(range(k)))
@@ -21,10 +35,140 @@ class VertexColoring(object):
         #Since a neighboring vertex cant have the same color, the rule is
         #v1 != v2
         for e in graph.edges:
-            v1 = e.sp.id
-            v2 = e.ep.id
-            cn.add_constraint([v1,v2], str(v1) + "!=" + str(v2))
+            cn.add_not_equal(e.sp.id, e.ep.id)
+
+        #A clique needs as many colors as it has vertices. The != constraints
+        #of its edges can't see that, an AllDifferent over it can.
+        for clique in cliques or []:
+            if all(v in graph.vertices for v in clique):
+                cn.add_all_different(clique)
 
         #When the ConstraintNetwork is returned it contains all domains,
         #constraints and variables necessary for running a*-gac
-        return cn
\ No newline at end of file
+        return cn
+
+    #Removes the vertices with fewer than k neighbors, again and again until
+    #every vertex left has at least k. Such a vertex can always be colored
+    #after its neighbors, since they use at most k-1 of the colors. Returns
+    #the k-core, the graph of the vertices left, and the ids of the removed
+    #vertices in the order they were removed.
+    def peel(graph, k):
+        adjacent = VertexColoring.neighbors(graph)
+        degree = dict((v, len(adjacent[v])) for v in adjacent)
+        stack = [v for v in graph.vertices if degree[v] < k]
+        removed = set(stack)
+        peeled = []
+        while stack:
+            v = stack.pop()
+            peeled.append(v)
+            for n in adjacent[v]:
+                degree[n] -= 1
+                if degree[n] < k and n not in removed:
+                    removed.add(n)
+                    stack.append(n)
+        core = GraphModel()
+        for v, vertex in graph.vertices.items():
+            if v not in removed:
+                core.add_vertex(vertex)
+        for e in graph.edges:
+            if e.sp.id not in removed and e.ep.id not in removed:
+                core.add_edge(e)
+        return core, peeled
+
+    #Colors the peeled vertices in the reverse order they were peeled, each
+    #with the lowest color not used by its neighbors. coloring is a dict of
+    #vertex id to color for the core, and is extended with the peeled vertices.
+    #When a vertex is colored, its colored neighbors are the ones left when it
+    #was peeled, fewer than k, so the color is always below k.
+    def color_peeled(graph, coloring, peeled):
+        adjacent = VertexColoring.neighbors(graph)
+        for v in reversed(peeled):
+            used = set(coloring[n] for n in adjacent[v] if n in coloring)
+            color = 0
+            while color in used:
+                color += 1
+            coloring[v] = color
+        return coloring
+
+    #Finds cliques greedily. A clique is grown from each vertex, by adding
+    #the candidate, a vertex adjacent to every vertex in the clique, with the
+    #most neighbors among the other candidates, the first in the graph order
+    #on ties. Returns the distinct cliques with at least min_size vertices,
+    #largest first. The size of the first is a lower bound on the chromatic
+    #number.
+    #starts limits the cliques grown to the ones from that many vertices with
+    #the highest degree, for large graphs where growing from every vertex
+    #takes too long.
+    def cliques(graph, min_size=3, starts=None):
+        adjacent = VertexColoring.neighbors(graph)
+        position = dict((v, i) for i, v in enumerate(graph.vertices))
+        found = set()
+        cliques = []
+        origins = graph.vertices
+        if starts is not None:
+            origins = sorted(graph.vertices, key=lambda v: len(adjacent[v]), reverse=True)[:starts]
+        for v in origins:
+            clique = [v]
+            candidates = set(adjacent[v])
+            while candidates:
+                u = max(candidates, key=lambda u: (len(adjacent[u] & candidates), -position[u]))
+                clique.append(u)
+                candidates &= adjacent[u]
+            key = frozenset(clique)
+            if len(clique) >= min_size and key not in found:
+                found.add(key)
+                cliques.append(sorted(clique, key=position.get))
+        cliques.sort(key=len, reverse=True)
+        return cliques
+
+    #Colors the graph greedily, vertices with the highest degree first
+    #(Welsh-Powell). Each vertex gets the lowest color not used by its
+    #neighbors. Returns a dict of vertex id to color. The number of colors
+    #used is an upper bound on the chromatic number.
+    def greedy_coloring(graph):
+        neighbors = VertexColoring.neighbors(graph)
+        order = sorted(graph.vertices, key=lambda v: len(neighbors[v]), reverse=True)
+        coloring = {}
+        for v in order:
+            used = set(coloring[n] for n in neighbors[v] if n in coloring)
+            color = 0
+            while color in used:
+                color += 1
+            coloring[v] = color
+        return coloring
+
+    #Adjacency sets of the graph, vertex id to the ids of its neighbors
+    def neighbors(graph):
+        adjacent = dict((v, set()) for v in graph.vertices)
+        for e in graph.edges:
+            adjacent[e.sp.id].add(e.ep.id)
+            adjacent[e.ep.id].add(e.sp.id)
+        return adjacent
+
+    #Splits the graph into its connected components. Coloring constraints
+    #never cross components, so each can be solved on its own. Returns a list
+    #of GraphModels sharing the graph's NodeModels and EdgeModels, largest
+    #first. The vertices of a component keep their order from the graph.
+    def components(graph):
+        adjacent = VertexColoring.neighbors(graph)
+        component_of = {}
+        count = 0
+        for start in graph.vertices:
+            if start in component_of:
+                continue
+            component_of[start] = count
+            stack = [start]
+            while stack:
+                v = stack.pop()
+                for n in adjacent[v]:
+                    if n not in component_of:
+                        component_of[n] = count
+                        stack.append(n)
+            count += 1
+        parts = [GraphModel() for i in range(count)]
+        for v, vertex in graph.vertices.items():
+            parts[component_of[v]].add_vertex(vertex)
+        for e in graph.edges:
+            parts[component_of[e.sp.id]].add_edge(e)
+        parts.sort(key=lambda part: len(part.vertices), reverse=True)
+        return parts